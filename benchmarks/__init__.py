@@ -0,0 +1,2 @@
+# coding=utf-8
+"""performance benchmarks of pricing and curve generation"""
@@ -0,0 +1,362 @@
+# coding=utf-8
+"""
+benchmark suite
+each case is timed several times with fresh state and pricing cache switched off, results are written as json
+and compared against a stored baseline, the run fails if any case is slower than baseline beyond tolerance
+
+usage:
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+"""
+
+from argparse import ArgumentParser
+from json import dumps, loads
+from os import cpu_count
+from os.path import join as path_join
+from platform import platform, python_version
+from statistics import median
+from sys import exit as sys_exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from cli import load_portfolio
+from instrument import InstParam, InstType, Instrument
+from instrument.cache import pricing_cache
+from instrument.default_param import env_default_param
+from instrument.env_param import EngineMethod, EngineParam, EnvParam, PlotParam, TreeType
+from instrument.market import Market
+from instrument.portfolio import CurveType, Portfolio, SurfaceAxis
+from instrument.scenario import ScenarioSet
+from numpy import arange, tile
+from utils.black_scholes import BlackScholes
+from utils.monte_carlo import MonteCarlo
+
+default_baseline = 'benchmarks/baseline.json'
+
+default_tolerance = 1.25
+
+mc_iterations = [10 ** 4, 10 ** 5, 10 ** 6]
+
+# Monte-Carlo worker processes, timings only scale with as many CPUs (see cpu_count of machine in results)
+mc_workers = [1, 2, 4]
+
+tree_steps = [100, 500]
+
+# spot and time steps
+pde_steps = [(500, 200)]
+
+book_sizes = [10, 100]
+
+stress_size = 1000
+
+# None for adaptive grid
+grid_steps = [1, 0.1, None]
+
+
+class Case(object):
+    """
+    benchmark case
+    setup_ builds fresh input for each repeat and is not timed, func_ is called on its result
+    """
+    def __init__(self, name_, func_, setup_=None, repeat_=5):
+        self.name = name_
+        self._func = func_
+        self._setup = setup_ or (lambda: None)
+        self._repeat = repeat_
+
+    def run(self):
+        """time the case after one warm-up call, return statistics of timings in seconds"""
+        self._func(self._setup())
+        _timing = []
+        for _ in range(self._repeat):
+            _input = self._setup()
+            _start = perf_counter()
+            self._func(_input)
+            _timing.append(perf_counter() - _start)
+        return dict(min=min(_timing), median=median(_timing), repeat=self._repeat)
+
+
+def _mkt():
+    return Market.from_dict({_param: env_default_param[_param] for _param in [
+        EnvParam.RiskFreeRate.value, EnvParam.UdVolatility.value, EnvParam.UdDivYieldRatio.value,
+        EnvParam.UdSpotForPrice.value, EnvParam.PortMaturity.value, EnvParam.RateFormat.value]})
+
+
+def _engine(method_, iteration_=None, workers_=1):
+    if method_ == EngineMethod.BS.value:
+        return dict(engine=method_, param={})
+    return dict(engine=method_, param={EngineParam.MCIteration.value: iteration_, EngineParam.MCSeed.value: 0,
+                                       EngineParam.MCWorkers.value: workers_})
+
+
+def _tree_engine(steps_, type_=TreeType.Binomial.value):
+    return dict(engine=EngineMethod.Tree.value, param={EngineParam.TreeSteps.value: steps_,
+                                                       EngineParam.TreeType.value: type_})
+
+
+def _pde_engine(space_steps_, time_steps_):
+    return dict(engine=EngineMethod.PDE.value, param={EngineParam.PDESpotSteps.value: space_steps_,
+                                                      EngineParam.PDETimeSteps.value: time_steps_})
+
+
+def _book_data(size_, american_=False):
+    """book of calls and puts around the money, every tenth leg is shown, puts are American with american_"""
+    _maturity = env_default_param[EnvParam.PortMaturity.value]
+    _data = []
+    for _idx in range(size_):
+        _data.append({
+            InstParam.InstType.value: [InstType.CallOption.value, InstType.PutOption.value][_idx % 2],
+            InstParam.OptionStrike.value: 80 + _idx % 41,
+            InstParam.OptionMaturity.value: _maturity,
+            InstParam.InstUnit.value: 1 - 2 * (_idx % 3 == 0),
+            InstParam.InstCost.value: 5,
+            InstParam.OptionAmerican.value: american_ and _idx % 2 == 1,
+            PlotParam.Show.value: _idx % 10 == 0,
+        })
+    return _data
+
+
+def _portfolio(size_, engine_, american_=False):
+    _data = _book_data(size_, american_)
+    _inst = [Instrument.get_inst(_row) for _row in _data]
+    _port = Portfolio(_inst)
+    _port.set_mkt(dict(env_default_param))
+    _port.set_engine(engine_)
+    _port.set_show([_i for _i, _row in zip(_inst, _data) if _row[PlotParam.Show.value]])
+    return _port
+
+
+def option_cases():
+    """single option pricing under each engine"""
+    _option = Instrument.get_inst({InstParam.InstType.value: InstType.CallOption.value,
+                                   InstParam.OptionStrike.value: 100, InstParam.OptionMaturity.value: 1,
+                                   InstParam.InstUnit.value: 1})
+    _cases = []
+    for _func in ['pv', 'delta', 'gamma']:
+        _cases.append(Case("option.{}.bs".format(_func),
+                           lambda _, f=_func, e=_engine(EngineMethod.BS.value): getattr(_option, f)(_mkt(), e),
+                           repeat_=50))
+        for _iteration in mc_iterations:
+            _cases.append(Case("option.{}.mc.{}".format(_func, _iteration),
+                               lambda _, f=_func, e=_engine(EngineMethod.MC.value, _iteration):
+                               getattr(_option, f)(_mkt(), e)))
+    return _cases
+
+
+def tree_cases():
+    """American put pricing and portfolio curves under tree engine"""
+    _option = Instrument.get_inst({InstParam.InstType.value: InstType.PutOption.value,
+                                   InstParam.OptionStrike.value: 100, InstParam.OptionMaturity.value: 1,
+                                   InstParam.InstUnit.value: 1, InstParam.OptionAmerican.value: True})
+    _cases = []
+    for _type in TreeType:
+        for _steps in tree_steps:
+            _cases.append(Case("option.risk.tree.{}.{}".format(_type.name, _steps),
+                               lambda _, e=_tree_engine(_steps, _type.value): _option.risk(_mkt(), e)))
+        for _curve in [CurveType.PV, CurveType.Delta, CurveType.Gamma]:
+            _cases.append(Case(
+                "curve.{}.tree.{}.{}.{}".format(_curve.name, _type.name, book_sizes[0], grid_steps[0]),
+                lambda p, t=_curve.value: p.gen_curve(t, step_=grid_steps[0], full_=True),
+                lambda e=_tree_engine(tree_steps[0], _type.value): _portfolio(book_sizes[0], e, True), repeat_=3))
+    return _cases
+
+
+def pde_cases():
+    """American put pricing and portfolio curves under PDE engine, every spot grid is priced by the same solves"""
+    _option = Instrument.get_inst({InstParam.InstType.value: InstType.PutOption.value,
+                                   InstParam.OptionStrike.value: 100, InstParam.OptionMaturity.value: 1,
+                                   InstParam.InstUnit.value: 1, InstParam.OptionAmerican.value: True})
+    _cases = []
+    for _space, _time in pde_steps:
+        _engine = _pde_engine(_space, _time)
+        _cases.append(Case("option.risk.pde.{}.{}".format(_space, _time),
+                           lambda _, e=_engine: _option.risk(_mkt(), e)))
+        for _size in book_sizes:
+            for _step in grid_steps[:2]:
+                for _curve in [CurveType.PV, CurveType.Delta, CurveType.Gamma]:
+                    _cases.append(Case(
+                        "curve.{}.pde.{}.{}".format(_curve.name, _size, _step),
+                        lambda p, t=_curve.value, s=_step: p.gen_curve(t, step_=s, full_=True),
+                        lambda n=_size, e=_engine: _portfolio(n, e, True), repeat_=3))
+    return _cases
+
+
+def implied_vol_cases():
+    """implied volatility of an option chain quoted at Black-Scholes prices"""
+    _cases = []
+    for _size in [10 ** 3, 10 ** 5]:
+        _strike = tile(arange(50., 150.), _size // 100)
+        _sign = tile([1, -1], _size // 2)
+        _t = tile([0.1, 0.25, 0.5, 1, 2], _size // 5)
+        _price = BlackScholes.pv(_sign, 100., _strike, rate=0.03, div=0.01, vol=0.3, t=_t)
+        _cases.append(Case("implied_vol.{}".format(_size),
+                           lambda _, s=_sign, p=_price, k=_strike, t=_t:
+                           BlackScholes.implied_vol(s, p, 100., k, rate=0.03, div=0.01, t=t)))
+    return _cases
+
+
+def monte_carlo_cases():
+    """stock price simulation"""
+    return [Case("monte_carlo.stock_price.{}".format(_iteration),
+                 lambda _, n=_iteration: MonteCarlo.stock_price(n, isp=100, rate=0.03, vol=0.3, t=1, seed=0))
+            for _iteration in mc_iterations]
+
+
+def workers_cases():
+    """Monte-Carlo draws and portfolio curves over the number of worker processes"""
+    _cases = []
+    for _workers in mc_workers:
+        _cases.append(Case("monte_carlo.normal.{}.workers.{}".format(mc_iterations[-1], _workers),
+                           lambda _, w=_workers: MonteCarlo.normal(mc_iterations[-1], seed_=0, workers_=w)))
+        _cases.append(Case(
+            "curve.PV.mc.{}.{}.workers.{}".format(book_sizes[-1], grid_steps[0], _workers),
+            lambda p: p.gen_curve(CurveType.PV.value, step_=grid_steps[0], full_=True),
+            lambda w=_workers: _portfolio(book_sizes[-1], _engine(EngineMethod.MC.value, mc_iterations[1], w)),
+            repeat_=3))
+    return _cases
+
+
+def curve_cases():
+    """portfolio curves of every type across book sizes and grid steps, with shown components"""
+    _cases = []
+    for _size in book_sizes:
+        for _step in grid_steps:
+            for _type in CurveType:
+                _cases.append(Case(
+                    "curve.{}.bs.{}.{}".format(_type.name, _size, 'adaptive' if _step is None else _step),
+                    lambda p, t=_type.value, s=_step: p.gen_curve(t, step_=s, full_=True),
+                    lambda n=_size: _portfolio(n, _engine(EngineMethod.BS.value)), repeat_=3))
+    for _type in [CurveType.PV, CurveType.Delta, CurveType.Gamma]:
+        _cases.append(Case(
+            "curve.{}.mc.{}.{}".format(_type.name, book_sizes[0], grid_steps[0]),
+            lambda p, t=_type.value: p.gen_curve(t, step_=grid_steps[0], full_=True),
+            lambda: _portfolio(book_sizes[0], _engine(EngineMethod.MC.value, mc_iterations[0])), repeat_=3))
+    return _cases
+
+
+def surface_cases():
+    """portfolio surfaces over spot and each second axis"""
+    _cases = []
+    for _axis in SurfaceAxis:
+        for _type in [CurveType.PV, CurveType.Gamma]:
+            _cases.append(Case(
+                "surface.{}.{}.bs.{}".format(_axis.name, _type.name, book_sizes[-1]),
+                lambda p, t=_type.value, a=_axis.value: p.gen_surface(t, a),
+                lambda: _portfolio(book_sizes[-1], _engine(EngineMethod.BS.value)), repeat_=3))
+            _cases.append(Case(
+                "surface.{}.{}.mc.{}".format(_axis.name, _type.name, book_sizes[0]),
+                lambda p, t=_type.value, a=_axis.value: p.gen_surface(t, a),
+                lambda: _portfolio(book_sizes[0], _engine(EngineMethod.MC.value, mc_iterations[0])), repeat_=3))
+    return _cases
+
+
+def _scenario(size_):
+    """scenario grid of spot, volatility, rate and time shocks"""
+    _shock = [(_spot, _vol, _rate, _time) for _spot in range(-30, 31, 5) for _vol in [-10, -5, 0, 5, 10]
+              for _rate in [-1, 0, 1] for _time in [0, 0.1, 0.25, 0.5]]
+    _shock = (_shock * (-(-size_ // len(_shock))))[:size_]
+    return ScenarioSet(range(size_), *zip(*[(_s, _v, _r, 0, _t) for _s, _v, _r, _t in _shock]))
+
+
+def stress_cases():
+    """portfolio stress PnL over a scenario set"""
+    _scenarios = _scenario(stress_size)
+    return [Case("stress.bs.{}.{}".format(book_sizes[-1], stress_size), lambda p: p.stress(_scenarios),
+                 lambda: _portfolio(book_sizes[-1], _engine(EngineMethod.BS.value)), repeat_=3),
+            Case("stress.mc.{}.{}".format(book_sizes[0], stress_size), lambda p: p.stress(_scenarios),
+                 lambda: _portfolio(book_sizes[0], _engine(EngineMethod.MC.value, mc_iterations[0])), repeat_=3)]
+
+
+def load_cases(dir_):
+    """portfolio json load, files in the format saved by the GUI are written to dir_"""
+    _cases = []
+    for _size in book_sizes + [1000]:
+        _path = path_join(dir_, "book_{}.json".format(_size))
+        with open(_path, 'w') as f:
+            f.write(dumps(dict(data=_book_data(_size), env=env_default_param)))
+        _cases.append(Case("portfolio.load.{}".format(_size), lambda _, p=_path: load_portfolio(p)))
+    return _cases
+
+
+def run_cases(filter_=None):
+    """run all cases matching filter_ with pricing cache switched off"""
+    _enabled = pricing_cache.enabled
+    pricing_cache.configure(enabled_=False)
+    _result = dict()
+    try:
+        with TemporaryDirectory() as _dir:
+            for _case in option_cases() + tree_cases() + pde_cases() + implied_vol_cases() + monte_carlo_cases() + \
+                    workers_cases() + curve_cases() + surface_cases() + stress_cases() + load_cases(_dir):
+                if filter_ and filter_ not in _case.name:
+                    continue
+                _result[_case.name] = _case.run()
+                print("{:<40} {:>12.6f} s".format(_case.name, _result[_case.name]['min']))
+    finally:
+        pricing_cache.configure(enabled_=_enabled)
+    return _result
+
+
+def compare(result_, baseline_, tolerance_=default_tolerance):
+    """
+    compare minimum timings with baseline
+    :return: list of (name, baseline, current, ratio) for cases slower than baseline by more than tolerance_
+    """
+    _regression = []
+    for _name, _stat in result_.items():
+        _base = baseline_.get(_name)
+        if _base is None or not _base['min']:
+            continue
+        _ratio = _stat['min'] / _base['min']
+        if _ratio > tolerance_:
+            _regression.append((_name, _base['min'], _stat['min'], _ratio))
+    return _regression
+
+
+def missing(result_, baseline_):
+    """names of cases run but without baseline timing, so they are not compared"""
+    return [_name for _name in result_ if not (baseline_.get(_name) or {}).get('min')]
+
+
+def parse_args(args_=None):
+    """parse command line arguments"""
+    _parser = ArgumentParser(description="Run pricing and curve generation benchmarks.")
+    _parser.add_argument('-k', '--filter', help="only run cases whose name contains this text")
+    _parser.add_argument('-o', '--output', help="write results to this json file")
+    _parser.add_argument('--save', nargs='?', const=default_baseline, help="store results as baseline")
+    _parser.add_argument('--compare', nargs='?', const=default_baseline, help="compare results with baseline")
+    _parser.add_argument('--tolerance', type=float, default=default_tolerance,
+                         help="slowdown ratio reported as regression (default {})".format(default_tolerance))
+    return _parser.parse_args(args_)
+
+
+def main(args_=None):
+    """entry point, returns number of regressions"""
+    _args = parse_args(args_)
+    _output = dict(
+        machine=dict(platform=platform(), python=python_version(), cpu_count=cpu_count()),
+        result=run_cases(_args.filter),
+    )
+    for _path in [_args.output, _args.save]:
+        if _path:
+            with open(_path, 'w') as f:
+                f.write(dumps(_output, indent=4))
+
+    if not _args.compare:
+        return 0
+    with open(_args.compare) as f:
+        _baseline = loads(f.read())
+    _regression = compare(_output['result'], _baseline['result'], _args.tolerance)
+    for _name, _base, _current, _ratio in _regression:
+        print("regression {:<40} {:.6f} s -> {:.6f} s ({:.2f}x)".format(_name, _base, _current, _ratio))
+    _missing = missing(_output['result'], _baseline['result'])
+    for _name in _missing:
+        print("no baseline {}".format(_name))
+    for _key, _value in _output['machine'].items():
+        if _baseline.get('machine', {}).get(_key) != _value:
+            print("baseline machine differs: {} {} -> {}".format(_key, _baseline.get('machine', {}).get(_key), _value))
+    print("{} regression(s), {} case(s) without baseline against {}".format(len(_regression), len(_missing),
+                                                                          _args.compare))
+    return len(_regression)
+
+
+if __name__ == '__main__':
+    sys_exit(1 if main() else 0)
@@ -0,0 +1,177 @@
+# coding=utf-8
+"""
+headless curve generator
+computes portfolio curves from saved portfolio files without loading the GUI
+
+usage: python cli.py docs/123.json -c PV -c Delta -f npz -o output
+       python cli.py docs/123.json --scenario stress.csv -o output
+"""
+
+from argparse import ArgumentParser
+from csv import writer as csv_writer
+from enum import Enum
+from json import loads
+from numpy import savez, vstack
+from os import listdir, makedirs
+from os.path import basename, isdir, join as path_join, splitext
+from sys import exit as sys_exit
+from instrument import Instrument
+from instrument.default_param import parse_env
+from instrument.env_param import PlotParam
+from instrument.portfolio import CurveType, Portfolio
+from instrument.scenario import ScenarioSet
+
+
+class OutputFormat(Enum):
+    """supported output file format"""
+    CSV = 'csv'
+    NPZ = 'npz'
+
+
+def load_portfolio(file_path_):
+    """
+    load portfolio saved by the GUI in format {"data": [...], "env": {...}}
+    :return: portfolio with market and engine set, and row index of each shown component
+    """
+    with open(file_path_) as f:
+        _input_data = loads(f.read())
+
+    _raw_data = _input_data.get('data')
+    _env = _input_data.get('env')
+    if not _raw_data or not _env:
+        raise ValueError("portfolio data and env are required")
+
+    _inst = [Instrument.get_inst(_data) for _data in _raw_data]
+    _show = [_idx for _idx, _data in enumerate(_raw_data) if _data.get(PlotParam.Show.value)]
+    _portfolio = Portfolio(_inst)
+    _mkt, _engine, _rounding = parse_env(_env)
+    _portfolio.set_mkt(_mkt)
+    _portfolio.set_engine(_engine)
+    _portfolio.set_show([_inst[_idx] for _idx in _show])
+    return _portfolio, _show
+
+
+def gen_curves(file_path_, types_, margin_=20, step_=1, full_=False):
+    """
+    compute curves of given types for one portfolio file, curves of all types share the same x
+    (with step_ None, one adaptive grid refined for all types, see Portfolio.gen_curves)
+    """
+    _portfolio, _show = load_portfolio(file_path_)
+    _x, _curves = _portfolio.gen_curves(list(types_), margin_, step_, full_)
+    return _x, _curves, _show if full_ else []
+
+
+def write_curves(output_path_, format_, x_, curves_, show_):
+    """write curves to csv (one column per curve) or npz (x and one array of curves per type)"""
+    if format_ == OutputFormat.NPZ.value:
+        savez(output_path_, x=x_, **curves_)
+        return
+
+    _header = ['Spot']
+    for _type in curves_:
+        _header += [_type] + ["{} Row {}".format(_type, _idx + 1) for _idx in show_]
+    with open(output_path_, 'w', newline='') as f:
+        _writer = csv_writer(f)
+        _writer.writerow(_header)
+        _writer.writerows(vstack([x_] + [_y for _y in curves_.values()]).T.tolist())
+
+
+def write_stress(output_path_, scenario_, pnl_):
+    """write stress PnL as csv, one row per scenario with portfolio total and one column per component"""
+    with open(output_path_, 'w', newline='') as f:
+        _writer = csv_writer(f)
+        _writer.writerow(['Scenario', 'Total'] + ["Row {}".format(_idx + 1) for _idx in range(pnl_.shape[1])])
+        _writer.writerows([[_name, _row.sum()] + _row.tolist() for _name, _row in zip(scenario_.name, pnl_)])
+
+
+def run_file(file_path_, output_dir_, format_, types_, margin_, step_, full_, profile_=False, scenario_=None):
+    """
+    compute and write curves of one portfolio file, errors are returned instead of raised
+    with profile_, timing reports of the curve requests are returned as text
+    with scenario_ (a ScenarioSet), stress PnL of each component is also written to <name>_stress.csv
+    """
+    if profile_:
+        from instrument.profile import format_report, profiler
+        profiler.enable()
+        profiler.clear()
+    try:
+        _name, _output_path = splitext(basename(file_path_))[0], []
+        if types_:
+            _x, _curves, _show = gen_curves(file_path_, types_, margin_, step_, full_)
+            _output_path.append(path_join(output_dir_, "{}.{}".format(_name, format_)))
+            write_curves(_output_path[-1], format_, _x, _curves, _show)
+        if scenario_ is not None:
+            _output_path.append(path_join(output_dir_, "{}_stress.csv".format(_name)))
+            write_stress(_output_path[-1], scenario_, load_portfolio(file_path_)[0].stress(scenario_))
+        _timing = "\n".join([format_report(_report) for _report in profiler.reports()]) if profile_ else None
+        return file_path_, ", ".join(_output_path), None, _timing
+    except Exception as e:
+        return file_path_, None, str(e), None
+
+
+def collect_files(paths_):
+    """expand directories into the json files they contain"""
+    _files = []
+    for _path in paths_:
+        if isdir(_path):
+            _files += [path_join(_path, _name) for _name in sorted(listdir(_path)) if _name.endswith('.json')]
+        else:
+            _files.append(_path)
+    return _files
+
+
+def parse_args(args_=None):
+    """parse command line arguments"""
+    _parser = ArgumentParser(description="Generate portfolio curves from saved portfolio files.")
+    _parser.add_argument('paths', nargs='+', help="portfolio json files or directories of them")
+    _parser.add_argument('-c', '--curve', action='append', dest='types', choices=[_t.value for _t in CurveType],
+                         help="curve type to generate, can be repeated (default all, none with --scenario)")
+    _parser.add_argument('-f', '--format', choices=[_f.value for _f in OutputFormat], default=OutputFormat.CSV.value,
+                         help="output file format (default csv)")
+    _parser.add_argument('-o', '--output', default='.', help="output directory (default current directory)")
+    _parser.add_argument('-w', '--workers', type=int, default=1, help="number of processes (default 1)")
+    _parser.add_argument('--margin', type=float, default=20, help="absolute spot margin around strikes (default 20)")
+    _parser.add_argument('--step', type=float, default=1, help="spot grid step (default 1)")
+    _parser.add_argument('--adaptive', action='store_true',
+                         help="use adaptive spot grid, dense around strikes and where curves bend, instead of --step")
+    _parser.add_argument('--full', action='store_true', help="also output curves of shown components")
+    _parser.add_argument('--profile', action='store_true', help="print timing of each curve stage and component")
+    _parser.add_argument('--scenario',
+                         help="scenario json or csv file, stress PnL of each scenario and component is also written")
+    return _parser.parse_args(args_)
+
+
+def main(args_=None):
+    """entry point, returns number of failed files"""
+    _args = parse_args(args_)
+    if _args.workers < 1:
+        raise ValueError("number of workers should be positive")
+
+    _scenario = ScenarioSet.load(_args.scenario) if _args.scenario else None
+    _types = _args.types or ([] if _scenario else [_t.value for _t in CurveType])
+    _files = collect_files(_args.paths)
+    makedirs(_args.output, exist_ok=True)
+
+    _step = None if _args.adaptive else _args.step
+    _jobs = [(_file, _args.output, _args.format, _types, _args.margin, _step, _args.full, _args.profile, _scenario)
+             for _file in _files]
+    if _args.workers > 1 and len(_jobs) > 1:
+        from utils.parallel import pool_imap
+        _results = pool_imap(run_file, _jobs, min(_args.workers, len(_jobs)))
+    else:
+        _results = (run_file(*_job) for _job in _jobs)
+
+    _failed = 0
+    for _file, _output_path, _error, _timing in _results:
+        if _error is None:
+            print("{} -> {}".format(_file, _output_path))
+            if _timing:
+                print(_timing)
+        else:
+            _failed += 1
+            print("{} failed: {}".format(_file, _error))
+    return _failed
+
+
+if __name__ == '__main__':
+    sys_exit(1 if main() else 0)
@@ -7,15 +7,25 @@ from PyQt5.QtWidgets import QDialog, QDialogButtonBox, QPlainTextEdit, QTabWidge
 help_content = [
     ("Inst Params", """1. Strike - strike price of an OPTION
 
-2. Qty - unit of each instrument
+2. Maturity - time to maturity of an OPTION (y)
+    * defaults to Portfolio Maturity of pricing env
+    * options of different maturities can be mixed
+    * an option of maturity 0 is expired and valued at intrinsic value
+
+3. Qty - unit of each instrument
     * could be a FLOAT number
     * could be NEGATIVE indicating SHORT position
 
-3. Premium - unit cost / premium of an OPTION"""),
+4. Premium - unit cost / premium of an OPTION
+
+5. Am. - American OPTION, exercisable at any time up to maturity
+    * priced by Tree or PDE engine only
+    * no implied volatility"""),
 
     ("Curve Types", """From portfolio view:
 1. Payoff Curve
     * portfolio payoff at maturity
+    * with mixed maturities, each option pays off at its own maturity
 2. PV Curve
     * portfolio current PV
 3. Delta Curve
@@ -23,20 +33,38 @@ help_content = [
 4. Gamma Curve
     * portfolio current Gamma
     * Monte-Carlo is not recommended
+5. Vega, Theta, Rho, Vanna and Volga Curves
+    * Vega and Rho per 1% change of volatility and rate
+    * Theta per year of elapsed time
+    * Vanna (Delta change) and Volga (Vega change) per 1% change of volatility
+    * Monte-Carlo, Tree and PDE revalue with bumped volatility, rate or time
+      (Monte-Carlo on the same paths)
 
 From investment view:
 1. Net Payoff Curve
     * portfolio payoff at maturity minus portfolio cost
 2. PnL Curve
     * portfolio current PnL
-    * portfolio PV minus portfolio cost"""),
+    * portfolio PV minus portfolio cost
+
+Monte-Carlo curves:
+    * refined batch by batch, the shaded band shows two standard errors
+    * press Stop in the status bar to keep the current estimate
+
+Surfaces (View > Surface):
+    * PnL, PV or any greek as a heatmap over spot and volatility
+      (50% to 150% of current volatility), or spot and elapsed time
+    * with elapsed time, options expire once it reaches their maturity"""),
 
     ("Pricing Tips", """1. Right click an OPTION for auto pricing
     * right click on the target line
 
 2. Edit pricing env in Menu - Config - Pricing Env
 
-3. Plotting for portfolios with STOCK may become confusing 
+3. Press Implied Vol for the Black-Scholes volatility implied
+    by the premium of each OPTION, under the pricing env
+
+4. Plotting for portfolios with STOCK may become confusing 
     when dividend yield is not zero.
     Because of the difference between STOCK and FORWARD, 
     STOCK cannot be used to hedge OPTION directly according 
@@ -46,13 +74,33 @@ From investment view:
 2. Underlying Volatility (%, default 30)
 3. Dividend Yield Ratio (%, default 0)
 4. Portfolio Maturity (y)
+    * default maturity of new options
 5. Cost Rounding (default 2)
 6. Rate Format (default Single)
     * Single or Compound (continuous)
     * if Single is chosen, 1 & 3 will shifted via:
     * r_c = (ln(1 + r / 100) - 1) * 100
 7. Pricing Engine (default Black-Scholes)
-    * Black-Scholes or Monte-Carlo""")
+    * Black-Scholes, Monte-Carlo, Tree or PDE
+    * Tree and PDE price American options, Delta and Gamma are read off
+      the tree or the PDE grid
+    * PDE (Crank-Nicolson) prices the whole curve in one solve, needs scipy
+8. Monte-Carlo Variance Reduction (default None)
+    * Antithetic - draws in pairs of opposite sign
+    * Control Variate - terminal spot with known forward
+9. Monte-Carlo Seed (default 0)
+    * same seed gives same result for any number of workers
+    * leave empty for a random seed
+10. Monte-Carlo Workers (default 1)
+    * number of processes used for Monte-Carlo curves
+11. Tree Steps (default 200)
+    * time steps of the tree, more steps are slower and more accurate
+12. Tree Type (default Binomial)
+    * Binomial - Cox-Ross-Rubinstein tree
+    * Trinomial - more accurate for the same steps, but slower
+13. PDE Spot Steps (default 500) and PDE Time Steps (default 200)
+    * spot grid runs from 0 to a few standard deviations above
+      the highest spot or strike""")
 ]
 
 
@@ -13,18 +13,23 @@ Pricing is now available for vanilla options based on Black-Scholes or Monte-Car
 from sys import path as sys_path
 from PyQt5.QtCore import QRect, Qt
 from PyQt5.QtWidgets import QApplication, QFileDialog, QHBoxLayout, QMainWindow, QMenu, QMessageBox, QPushButton
-from PyQt5.QtWidgets import QVBoxLayout, QWidget
+from PyQt5.QtWidgets import QProgressBar, QVBoxLayout, QWidget
 from gui.custom import CustomPushButton
 from gui.help import HelpDialog
 from gui.table import InstTable
-from gui.plot import PayoffCurve, PlotParam
-from gui.pricing_env import PricingEnv, parse_env
-from instrument import Instrument
-from instrument.default_param import env_default_param
-from instrument.env_param import EngineMethod
-from instrument.portfolio import CurveType, Portfolio
+from gui.timing import TimingDialog
+from gui.plot import PayoffCurve
+from gui.pricing_env import PricingEnv
+from gui.surface import SurfaceDialog
+from gui.worker import CurveWorker
+from instrument import InstParam, Instrument, option_type
+from instrument.default_param import env_default_param, parse_env
+from instrument.env_param import PlotParam
+from instrument.option import implied_vol_error
+from instrument.portfolio import CurveType, Portfolio, expiry_curve
 from json import dumps, loads
 from numpy import array
+from utils.black_scholes import ImpliedVolStatus
 from sys import argv as sys_argv, exit as sys_exit
 
 sys_path.append("{}/..".format(sys_path[0]))
@@ -40,10 +45,17 @@ btn_group = [
         ("Delta Curve", CurveType.Delta.value),
         ("Gamma Curve", CurveType.Gamma.value),
     ],
+    [
+        ("Vega Curve", CurveType.Vega.value),
+        ("Theta Curve", CurveType.Theta.value),
+        ("Rho Curve", CurveType.Rho.value),
+    ],
+    [
+        ("Vanna Curve", CurveType.Vanna.value),
+        ("Volga Curve", CurveType.Volga.value),
+    ],
 ]
 
-MC_warning_curve = [CurveType.PnL.value, CurveType.PV.value, CurveType.Delta.value, CurveType.Gamma.value]
-
 
 class ApplicationWindow(QMainWindow):
     """
@@ -65,6 +77,9 @@ class ApplicationWindow(QMainWindow):
         # initialize data storage
         self.env_data = env_default_param
         self._last_path = '.'
+        self._portfolio = Portfolio([])
+        self._worker = None
+        self._request_id = 0
         # setup and show
         self.setup_ui()
         self.show()
@@ -98,6 +113,7 @@ class ApplicationWindow(QMainWindow):
         _main_layout.addLayout(_vbox)
         self._main.setFocus()
         self.setCentralWidget(self._main)
+        self._set_status_bar()
         _width, _height = self._get_width_height()
         self.setGeometry(QRect(100, 100, _width, _height))
 
@@ -159,6 +175,17 @@ class ApplicationWindow(QMainWindow):
     def _pricing_env(self):
         self._env_box = PricingEnv(self)
 
+    def _timing(self):
+        self._timing_box = TimingDialog(self)
+
+    def _surface(self):
+        self._surface_box = SurfaceDialog(self)
+
+    def portfolio_surface(self, type_, axis_):
+        """surface of current portfolio, see Portfolio.gen_surface"""
+        self._cancel_worker()
+        return self._prepare_data().gen_surface(type_, axis_)
+
     def _about(self):
         QMessageBox.about(self, "About", __doc__)
 
@@ -170,6 +197,7 @@ class ApplicationWindow(QMainWindow):
 
     def closeEvent(self, ce):
         """event when close button is clicked"""
+        self._cancel_worker()
         self._quit()
 
     def _set_menu(self):
@@ -185,13 +213,29 @@ class ApplicationWindow(QMainWindow):
 
         _config = QMenu("&Config", self)
         _config.addAction("&Pricing Env", self._pricing_env, Qt.CTRL + Qt.Key_P)
+        _config.addAction("&Timing", self._timing, Qt.CTRL + Qt.Key_T)
         self._menu.addMenu(_config)
 
+        _view = QMenu("&View", self)
+        _view.addAction("&Surface", self._surface, Qt.CTRL + Qt.Key_U)
+        self._menu.addMenu(_view)
+
         _help = QMenu("&Help", self)
         _help.addAction("&Help", self._help, Qt.CTRL + Qt.Key_H)
         _help.addAction("&About", self._about, Qt.CTRL + Qt.Key_A)
         self._menu.addMenu(_help)
 
+    def _set_status_bar(self):
+        self._progress = QProgressBar()
+        self._progress.setMaximumWidth(200)
+        self._progress.setVisible(False)
+        self.statusBar().addPermanentWidget(self._progress)
+        self._stop_btn = QPushButton("Stop")
+        self._stop_btn.setToolTip("Stop refining the Monte-Carlo estimate and keep the current curve")
+        self._stop_btn.clicked.connect(self._stop_worker)
+        self._stop_btn.setVisible(False)
+        self.statusBar().addPermanentWidget(self._stop_btn)
+
     def _inst_btn_layout(self):
         _hbox = QHBoxLayout()
 
@@ -207,6 +251,11 @@ class ApplicationWindow(QMainWindow):
         _delete_btn.clicked.connect(self._delete)
         _hbox.addWidget(_delete_btn)
 
+        _vol_btn = QPushButton("Implied Vol")
+        _vol_btn.setToolTip("Implied volatility of each option from its premium")
+        _vol_btn.clicked.connect(self._implied_vol)
+        _hbox.addWidget(_vol_btn)
+
         return _hbox
 
     def _plot_btn_layout(self, btn_group_):
@@ -241,15 +290,31 @@ class ApplicationWindow(QMainWindow):
     def _prepare_data(self):
         _raw_data = self._table.collect()
         _inst = [Instrument.get_inst(_data) for _data in _raw_data] if _raw_data else []
-        _inst_show = [Instrument.get_inst(_data)
-                      for _data in filter(lambda x: x[PlotParam.Show.value], _raw_data)] if _raw_data else []
-        _portfolio = Portfolio(_inst)
+        _inst_show = [_i for _i, _data in zip(_inst, _raw_data) if _data[PlotParam.Show.value]]
+        # keep one portfolio, so that curves of unchanged instruments are reused
+        _portfolio = self._portfolio
+        _portfolio.set_components(_inst)
         _mkt, _engine, _rounding = parse_env(self.env_data)
         _portfolio.set_mkt(_mkt)
         _portfolio.set_engine(_engine)
         _portfolio.set_show(_inst_show)
         return _portfolio
 
+    def _implied_vol(self):
+        self._cancel_worker()
+        try:
+            _vol, _status = self._prepare_data().implied_vol()
+        except Exception as e:
+            QMessageBox.warning(self, "Implied Vol", "Invalid portfolio: {}".format(str(e)))
+            return
+        _lines = []
+        for _idx, (_data, _v, _s) in enumerate(zip(self._table.collect(), _vol, _status)):
+            if _data[InstParam.InstType.value] not in option_type:
+                continue
+            _lines.append("Row {}: {}".format(_idx + 1, "{:.4f}%".format(_v) if _s == ImpliedVolStatus.Solved.value
+                                              else implied_vol_error[_s]))
+        QMessageBox.information(self, "Implied Vol", "\n".join(_lines) or "No option in portfolio.")
+
     def _plot_payoff(self):
         self._plot_impl(CurveType.Payoff.value)
 
@@ -266,16 +331,69 @@ class ApplicationWindow(QMainWindow):
         self._plot_impl(CurveType.Delta.value)
 
     def _plot_impl(self, type_):
-        _portfolio = self._prepare_data()
-        if _portfolio.engine['engine'] == EngineMethod.MC.value and type_ in MC_warning_curve:
-            if QMessageBox.question(
-                    self, "Evaluation Cure",
-                    "Using Monte-Carlo to generate Evaluation Curve might be extremely time consuming. "
-                    "Are you sure to continue?") == QMessageBox.No:
-                return
-        _x, _y = _portfolio.gen_curve(type_, full_=True)
+        # a newer request replaces the running one, the portfolio is not touched until the old worker stops
+        self._cancel_worker()
+        try:
+            _portfolio = self._prepare_data()
+        except Exception as e:
+            QMessageBox.warning(self, "Plot Curve", "Invalid portfolio: {}".format(str(e)))
+            return
         _x_ref = 0 if type_ == CurveType.PnL.value else 100 if _portfolio.has_stock() else 0
-        self._plot.update_figure(dict(x=_x, y=_y, type=type_, x_ref=_x_ref, y_ref=_portfolio.center()))
+
+        self._request_id += 1
+        self._worker = CurveWorker(self._request_id, _portfolio, type_, dict(x_ref=_x_ref, y_ref=_portfolio.center()))
+        self._worker.progress.connect(self._on_curve_progress)
+        self._worker.partial_curve.connect(self._on_curve_partial)
+        self._worker.finished_curve.connect(self._on_curve_done)
+        self._worker.failed.connect(self._on_curve_failed)
+        self.statusBar().showMessage("Generating {} curve...".format(type_))
+        self._progress.setValue(0)
+        self._progress.setVisible(True)
+        self._stop_btn.setVisible(_portfolio.is_progressive(type_))
+        self._worker.start()
+
+    def _cancel_worker(self):
+        if self._worker is not None and self._worker.isRunning():
+            self._worker.cancel()
+            self._worker.wait()
+
+    def _stop_worker(self):
+        if self._worker is not None and self._worker.isRunning():
+            self._worker.stop()
+
+    def _on_curve_progress(self, request_id_, done_, total_):
+        if request_id_ == self._request_id:
+            self._progress.setMaximum(total_)
+            self._progress.setValue(done_)
+
+    def _on_curve_partial(self, request_id_, data_):
+        if request_id_ == self._request_id:
+            self._plot.update_figure(data_)
+
+    def _on_curve_done(self, request_id_, data_):
+        if request_id_ == self._request_id:
+            self._progress.setVisible(False)
+            self._stop_btn.setVisible(False)
+            self.statusBar().clearMessage()
+            self._plot.update_figure(data_)
+            if data_['type'] in expiry_curve:
+                self.statusBar().showMessage(self._payoff_summary(data_['type']))
+
+    def _payoff_summary(self, type_):
+        _profile = self._portfolio.payoff_profile(type_ == CurveType.NetPayoff.value)
+        _name = "Profit" if type_ == CurveType.NetPayoff.value else "Payoff"
+        _roots = _profile.roots()
+        return "Max {}: {:.4g}    Min {}: {:.4g}    {}: {}".format(
+            _name, _profile.max_value(), _name, _profile.min_value(),
+            "Break-even" if type_ == CurveType.NetPayoff.value else "Zero at",
+            ", ".join(["{:.4g}".format(_r) for _r in _roots]) if _roots.size else "none")
+
+    def _on_curve_failed(self, request_id_, message_):
+        if request_id_ == self._request_id:
+            self._progress.setVisible(False)
+            self._stop_btn.setVisible(False)
+            self.statusBar().clearMessage()
+            QMessageBox.warning(self, "Plot Curve", "An error occurred while generating curve: {}".format(message_))
 
     def _test(self):
         pass
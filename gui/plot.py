@@ -1,17 +1,12 @@
 # coding=utf-8
 """plotting template"""
 
-from enum import Enum
 from gui.custom import CustomMplCanvas
+from instrument.env_param import PlotParam
 from numpy import array, zeros
 from utils import PRECISION_ZERO
 
 
-class PlotParam(Enum):
-    """plotting parameters"""
-    Show = 'Show'
-
-
 plot_default_param = {
     PlotParam.Show.value: False,
 }
@@ -24,12 +19,14 @@ class PayoffCurve(CustomMplCanvas):
         """
         plot payoff curve using given data
         :param data_: a dict consists with x (numpy array) and y (numpy array) in same dimension
+            optional y_err (numpy array in same dimension as y) is drawn as a confidence band of two standard errors
         """
         _x = data_.get('x', array([]))
         _y = array(data_.get('y', [array([])]))
         _type = data_.get('type')
         _x_ref = data_.get('x_ref', 0)
         _y_ref = data_.get('y_ref', 100)
+        _y_err = data_.get('y_err')
 
         if not _type:
             raise ValueError("plot type is required")
@@ -47,6 +44,12 @@ class PayoffCurve(CustomMplCanvas):
                     self._axes.plot(_x, _line, color="blue", linestyle='--')
             self._axes.plot(_x, _y[0], color="red", linestyle='-')
 
+            if _y_err is not None:
+                _err = array(_y_err)
+                for _line, _line_err, _color in zip(_y, _err, ["red"] + ["blue"] * (len(_y) - 1)):
+                    self._axes.fill_between(_x, _line - 2 * _line_err, _line + 2 * _line_err, color=_color,
+                                            alpha=0.15, linewidth=0)
+
         self._set_axis(_type)
 
     def update_figure(self, data_):
@@ -71,3 +74,43 @@ class PayoffCurve(CustomMplCanvas):
         self._axes.set_title("Option Portfolio {} Curve".format(type_))
         self._axes.grid(axis='x', linewidth=0.75, linestyle='-', color='0.75')
         self._axes.grid(axis='y', linewidth=0.75, linestyle='-', color='0.75')
+
+
+class RiskSurface(CustomMplCanvas):
+    """figure canvas for plotting portfolio surface as a heatmap"""
+
+    def _plot_figure(self, data_):
+        """
+        plot portfolio surface using given data
+        :param data_: a dict consists with x (spot, numpy array), z (second axis, numpy array),
+            y (numpy array in shape of (z, x)), type (curve type) and axis (label of z)
+        """
+        _x = data_.get('x', array([]))
+        _z = data_.get('z', array([]))
+        _y = array(data_.get('y', zeros((0, 0))))
+        _type = data_.get('type')
+        _axis = data_.get('axis', '')
+
+        if not _type:
+            raise ValueError("plot type is required")
+
+        self._fig.clear()
+        self._axes = self._fig.add_subplot(111)
+        if _x.size and _z.size and _y.size:
+            _mesh = self._axes.pcolormesh(_x, _z, _y, shading='nearest', cmap='RdYlGn')
+            self._fig.colorbar(_mesh, ax=self._axes, label=_type)
+        self._axes.set_xlabel("Spot")
+        self._axes.set_ylabel(_axis)
+        self._axes.set_title("Option Portfolio {} Surface".format(_type))
+
+    def update_figure(self, data_):
+        """update portfolio surface using new data, see _plot_figure"""
+        self._plot_figure(data_)
+        self.draw()
+
+    def save(self, file_path_):
+        """
+        save figure to file using given path
+        :param file_path_: a str indicating path to save figure file
+        """
+        self.print_png(file_path_)
@@ -3,11 +3,10 @@
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QButtonGroup, QDialog, QDialogButtonBox, QHBoxLayout, QLabel, QVBoxLayout, QLineEdit
-from copy import deepcopy
 from enum import Enum
 from gui.custom import CustomRadioButton
 from instrument.default_param import env_default_param
-from instrument.env_param import EngineMethod, EngineParam, EnvParam, RateFormat
+from instrument.env_param import EngineMethod, EngineParam, EnvParam, RateFormat, TreeType, VarReduction
 from utils import float_int
 
 
@@ -29,7 +28,7 @@ env_param = [
      None, None, None),
     (FieldType.Number.value, EnvParam.UdSpotForPrice.value, "Ud Spot for Pricing:", fixed_width,
      None, None, None),
-    (FieldType.Number.value, EnvParam.PortMaturity.value, "Time to Maturity (Y):", fixed_width,
+    (FieldType.Number.value, EnvParam.PortMaturity.value, "Default Maturity (Y):", fixed_width,
      None, None, None),
     (FieldType.Number.value, EnvParam.CostRounding.value, "Instrument Cost Rounding:", fixed_width,
      None, None, None),
@@ -39,6 +38,20 @@ env_param = [
      [_e.value for _e in EngineMethod], None, None),
     (FieldType.Number.value, EngineParam.MCIteration.value, "Monte-Carlo Iterations:", fixed_width,
      None, EnvParam.PricingEngine.value, EngineMethod.MC.value),
+    (FieldType.Number.value, EngineParam.MCSeed.value, "Monte-Carlo Seed:", fixed_width,
+     None, EnvParam.PricingEngine.value, EngineMethod.MC.value),
+    (FieldType.Number.value, EngineParam.MCWorkers.value, "Monte-Carlo Workers:", fixed_width,
+     None, EnvParam.PricingEngine.value, EngineMethod.MC.value),
+    (FieldType.Radio.value, EngineParam.MCVarReduction.value, "Monte-Carlo Variance Reduction:", fixed_width,
+     [_v.value for _v in VarReduction], EnvParam.PricingEngine.value, EngineMethod.MC.value),
+    (FieldType.Number.value, EngineParam.TreeSteps.value, "Tree Steps:", fixed_width,
+     None, EnvParam.PricingEngine.value, EngineMethod.Tree.value),
+    (FieldType.Radio.value, EngineParam.TreeType.value, "Tree Type:", fixed_width,
+     [_t.value for _t in TreeType], EnvParam.PricingEngine.value, EngineMethod.Tree.value),
+    (FieldType.Number.value, EngineParam.PDESpotSteps.value, "PDE Spot Steps:", fixed_width,
+     None, EnvParam.PricingEngine.value, EngineMethod.PDE.value),
+    (FieldType.Number.value, EngineParam.PDETimeSteps.value, "PDE Time Steps:", fixed_width,
+     None, EnvParam.PricingEngine.value, EngineMethod.PDE.value),
 ]
 
 
@@ -117,7 +130,7 @@ class PricingEnv(QDialog):
                 _btn_group.addButton(_wgt, _idx)
             _vbox.addLayout(_hbox)
             self._main_layout.addLayout(_vbox)
-            _default = self._parent.env_data.get(param_[1])
+            _default = self._parent.env_data.get(param_[1], env_default_param[param_[1]])
             self.__getattribute__(_default).setChecked(True)
 
     def _radio_connection(self, wgt_name_):
@@ -161,12 +174,3 @@ class PricingEnv(QDialog):
         else:
             return None
 
-
-def parse_env(env_param_):
-    """parse environment data into market, engine, and rounding"""
-    _mkt = deepcopy(env_param_)
-    _engine = dict(engine=_mkt.pop(EnvParam.PricingEngine.value), param={})
-    for _engine_param in [_param for _param in env_param if _param[5] == EnvParam.PricingEngine.value]:
-        _engine['param'][_engine_param[1]] = _mkt.pop(_engine_param[1])
-    _rounding = _mkt.pop(EnvParam.CostRounding.value)
-    return _mkt, _engine, _rounding
@@ -0,0 +1,74 @@
+# coding=utf-8
+"""portfolio surface dialog"""
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QComboBox, QDialog, QDialogButtonBox, QFileDialog, QHBoxLayout, QLabel, QMessageBox, \
+    QPushButton, QVBoxLayout
+from gui.plot import RiskSurface
+from instrument.portfolio import SurfaceAxis, greek_curve, risk_curve
+from numpy import array
+
+axis_label = {
+    SurfaceAxis.Volatility.value: "Volatility (%)",
+    SurfaceAxis.Time.value: "Elapsed Time (Y)",
+}
+
+
+class SurfaceDialog(QDialog):
+    """
+    dialog showing portfolio PnL, PV or a greek over spot and volatility, or spot and elapsed time
+    the surface is evaluated on the current portfolio and pricing env when Plot is pressed
+    """
+    def __init__(self, parent_, *args, **kwargs):
+        self._parent = parent_
+        super(SurfaceDialog, self).__init__(*args, **kwargs)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle("Surface")
+        # initialize basic widgets
+        self._main_layout = QVBoxLayout(self)
+        self._type = QComboBox()
+        self._axis = QComboBox()
+        self._plot = RiskSurface(dict(type=risk_curve[0]), self)
+        # setup and show
+        self.setup_ui()
+        self.setLayout(self._main_layout)
+        self.show()
+
+    def setup_ui(self):
+        """setup all ui components"""
+        _hbox = QHBoxLayout()
+        _hbox.addWidget(QLabel("Curve:"))
+        self._type.addItems(risk_curve + greek_curve)
+        _hbox.addWidget(self._type)
+        _hbox.addWidget(QLabel("Against Spot and:"))
+        self._axis.addItems([_a.value for _a in SurfaceAxis])
+        _hbox.addWidget(self._axis)
+        _hbox.addStretch()
+        self._main_layout.addLayout(_hbox)
+        self._main_layout.addWidget(self._plot)
+
+        _btn = QDialogButtonBox(QDialogButtonBox.Ok)
+        _btn.accepted.connect(self.accept)
+        _plot = QPushButton("Plot")
+        _plot.setDefault(True)
+        _plot.clicked.connect(self.plot)
+        _btn.addButton(_plot, QDialogButtonBox.ActionRole)
+        _export = QPushButton("Export")
+        _export.clicked.connect(self._export)
+        _btn.addButton(_export, QDialogButtonBox.ActionRole)
+        self._main_layout.addWidget(_btn)
+
+    def plot(self):
+        """evaluate and plot surface of selected curve type and axis"""
+        _type, _axis = self._type.currentText(), self._axis.currentText()
+        try:
+            _x, _z, _y = self._parent.portfolio_surface(_type, _axis)
+        except Exception as e:
+            QMessageBox.warning(self, "Plot Surface", "Failed to generate surface: {}".format(str(e)))
+            return
+        self._plot.update_figure(dict(x=_x, z=_z, y=array(_y), type=_type, axis=axis_label[_axis]))
+
+    def _export(self):
+        _file_path, _file_type = QFileDialog.getSaveFileName(self, "Save Surface", '.', "PNG Files (*.png)")
+        if _file_path:
+            self._plot.save(_file_path)
@@ -5,11 +5,9 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QAbstractItemView, QMessageBox, QTableWidgetItem
 from enum import Enum
 from gui.custom import CustomCheckBox, CustomComboBox, CustomTableWidget
-from gui.plot import PlotParam
-from gui.pricing_env import parse_env
 from instrument import InstType, InstParam, Instrument, option_type
-from instrument.default_param import default_param, default_type
-from instrument.env_param import EnvParam
+from instrument.default_param import default_param, default_type, parse_env
+from instrument.env_param import EnvParam, PlotParam
 from utils import float_int
 
 
@@ -20,6 +18,7 @@ class TableCol(Enum):
     Maturity = 'Maturity'
     Qty = 'Qty'
     Premium = 'Premium'
+    American = 'American'
     Show = 'Show'
 
 
@@ -34,12 +33,18 @@ class ColType(Enum):
 table_col = [
     (TableCol.Type.value, ColType.Other.value, "Type", InstParam.InstType.value, 80),
     (TableCol.Strike.value, ColType.Number.value, "Strike", InstParam.OptionStrike.value, 50),
+    (TableCol.Maturity.value, ColType.Number.value, "Maturity", InstParam.OptionMaturity.value, 60),
     (TableCol.Qty.value, ColType.Number.value, "Qty", InstParam.InstUnit.value, 50),
     (TableCol.Premium.value, ColType.Number.value, "Premium", InstParam.InstCost.value, 60),
+    (TableCol.American.value, ColType.Boolean.value, "Am.", InstParam.OptionAmerican.value, 30),
     (TableCol.Show.value, ColType.Boolean.value, "", PlotParam.Show.value, 30),
 ]
 
 
+# default values taken from pricing environment
+env_default = [EnvParam.UdSpotForPrice.value, EnvParam.PortMaturity.value]
+
+
 class InstTable(CustomTableWidget):
     """
     instrument table widget to edit instrument info
@@ -71,8 +76,8 @@ class InstTable(CustomTableWidget):
         for _idx, _col in enumerate(table_col):
             if _col[1] in [ColType.String.value, ColType.Number.value]:
                 _default = default_param[_type].get(_col[3], '-')
-                if _default == EnvParam.UdSpotForPrice.value:
-                    _default = self._parent.env_data.get(EnvParam.UdSpotForPrice.value, '-')
+                if _default in env_default:
+                    _default = self._parent.env_data.get(_default, '-')
                 _content = data_.get(_col[3], _default) if data_ else _default
                 _wgt = QTableWidgetItem(str(_content))
                 _wgt.setTextAlignment(Qt.AlignCenter)
@@ -140,7 +145,7 @@ class InstTable(CustomTableWidget):
     def _collect_row_full(self, row_):
         _data_dict = self._collect_row(row_)
         _type = _data_dict.get(InstParam.InstType.value)
-        if _type in option_type:
+        if _type in option_type and _data_dict.get(InstParam.OptionMaturity.value) is None:
             _data_dict[InstParam.OptionMaturity.value] = self._parent.env_data[EnvParam.PortMaturity.value]
         return _data_dict
 
@@ -176,8 +181,8 @@ class InstTable(CustomTableWidget):
                 for _idx, _col in enumerate(table_col):
                     if _col[1] in [ColType.String.value, ColType.Number.value]:
                         _default = default_param[_type].get(_col[3], '-')
-                        if _default == EnvParam.UdSpotForPrice.value:
-                            _default = self._parent.env_data.get(EnvParam.UdSpotForPrice.value, '-')
+                        if _default in env_default:
+                            _default = self._parent.env_data.get(_default, '-')
                         self.item(_row, _idx).setText(str(_default))
                         self.item(_row, _idx).setFlags(Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemIsSelectable)
                     elif _col[1] == ColType.Boolean.value:
@@ -190,9 +195,11 @@ class InstTable(CustomTableWidget):
 
                 if _type == InstType.Stock.value:
                     for _idx, _col in enumerate(table_col):
-                        if _col[3] in [InstParam.OptionStrike.value]:
+                        if _col[3] in [InstParam.OptionStrike.value, InstParam.OptionMaturity.value]:
                             self.item(_row, _idx).setText('-')
                             self.item(_row, _idx).setFlags(Qt.ItemIsSelectable)
+                        elif _col[3] == InstParam.OptionAmerican.value:
+                            self.item(_row, _idx).setFlags(Qt.ItemIsSelectable)
                 return
         raise ValueError("missing default value of {}".format(wgt_name_))
 
@@ -0,0 +1,71 @@
+# coding=utf-8
+"""timing report dialog"""
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QCheckBox, QDialog, QDialogButtonBox, QPlainTextEdit, QPushButton, QVBoxLayout
+from instrument.profile import format_report, profiler
+
+
+class TimingDialog(QDialog):
+    """
+    dialog showing where the time of recent curve requests went
+    profiling could be switched on / off here, it costs nothing while off
+    """
+    def __init__(self, parent_, *args, **kwargs):
+        self._parent = parent_
+        super(TimingDialog, self).__init__(*args, **kwargs)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle("Timing")
+        self.resize(640, 480)
+        # initialize basic widgets
+        self._main_layout = QVBoxLayout(self)
+        self._text = QPlainTextEdit()
+        self._switch = QCheckBox("Record timing of curve requests")
+        # setup and show
+        self.setup_ui()
+        self.setLayout(self._main_layout)
+        self.show()
+
+    def setup_ui(self):
+        """setup all ui components"""
+        self._switch.setChecked(profiler.enabled)
+        self._switch.toggled.connect(self._on_switch)
+        self._main_layout.addWidget(self._switch)
+
+        self._text.setReadOnly(True)
+        self._text.setFont(QFont("Courier"))
+        self._main_layout.addWidget(self._text)
+        self.refresh()
+
+        _btn = QDialogButtonBox(QDialogButtonBox.Ok)
+        _btn.button(QDialogButtonBox.Ok).setDefault(True)
+        _btn.accepted.connect(self.accept)
+        _refresh = QPushButton("Refresh")
+        _refresh.clicked.connect(self.refresh)
+        _btn.addButton(_refresh, QDialogButtonBox.ActionRole)
+        _clear = QPushButton("Clear")
+        _clear.clicked.connect(self._on_clear)
+        _btn.addButton(_clear, QDialogButtonBox.ResetRole)
+        self._main_layout.addWidget(_btn)
+
+    def refresh(self):
+        """show reports of recent requests, latest first"""
+        _reports = profiler.reports()
+        if _reports:
+            self._text.setPlainText("\n\n".join([format_report(_report) for _report in reversed(_reports)]))
+        elif profiler.enabled:
+            self._text.setPlainText("No curve request recorded yet, plot a curve and refresh.")
+        else:
+            self._text.setPlainText("Timing is off, switch it on above and plot a curve.")
+
+    def _on_switch(self, checked_):
+        if checked_:
+            profiler.enable()
+        else:
+            profiler.disable()
+        self.refresh()
+
+    def _on_clear(self):
+        profiler.clear()
+        self.refresh()
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""background curve generation"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from instrument.portfolio import CurveCancelled
+
+
+class CurveWorker(QThread):
+    """
+    generate a portfolio curve off the GUI thread
+    progress is reported per spot grid chunk, and the request stops at the next chunk once cancelled
+    Monte-Carlo curves are refined batch by batch, each estimate is posted with its standard error
+    stopping a progressive request keeps the last estimate as the result
+    """
+    progress = pyqtSignal(int, int, int)
+    partial_curve = pyqtSignal(int, dict)
+    finished_curve = pyqtSignal(int, dict)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, request_id_, portfolio_, type_, plot_data_, *args, **kwargs):
+        super(CurveWorker, self).__init__(*args, **kwargs)
+        self._id = request_id_
+        self._portfolio = portfolio_
+        self._type = type_
+        self._plot_data = plot_data_
+        self._cancelled = False
+        self._stopped = False
+        self._last = None
+
+    def cancel(self):
+        """cancel the request, no result will be posted"""
+        self._cancelled = True
+
+    def stop(self):
+        """stop refining the curve, the last estimate is posted as result"""
+        self._stopped = True
+
+    def run(self):
+        """generate curve and post result or error message back through signals"""
+        try:
+            if self._portfolio.is_progressive(self._type):
+                self._run_progressive()
+                return
+            _x, _y = self._portfolio.gen_curve(self._type, step_=None, full_=True, progress_=self._on_progress)
+        except CurveCancelled:
+            if self._stopped and not self._cancelled and self._last is not None:
+                self.finished_curve.emit(self._id, self._last)
+            return
+        except Exception as e:
+            if not self._cancelled:
+                self.failed.emit(self._id, str(e))
+            return
+
+        if not self._cancelled:
+            self.finished_curve.emit(self._id, dict(self._plot_data, x=_x, y=_y, type=self._type))
+
+    def _run_progressive(self):
+        for _x, _y, _err in self._portfolio.iter_curve(self._type, full_=True, progress_=self._on_progress):
+            self._last = dict(self._plot_data, x=_x, y=_y, y_err=_err, type=self._type)
+            if self._cancelled:
+                return
+            self.partial_curve.emit(self._id, self._last)
+        if not self._cancelled:
+            self.finished_curve.emit(self._id, self._last)
+
+    def _on_progress(self, done_, total_):
+        if self._cancelled or self._stopped:
+            return False
+        self.progress.emit(self._id, done_, total_)
+        return True
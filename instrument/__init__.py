@@ -2,9 +2,10 @@
 """definition of base instrument"""
 
 from enum import Enum
+from numpy import array
 from numpy.ma import exp
-from instrument.env_param import EngineMethod, EngineParam, EnvParam, RateFormat
-from utils import to_continuous_rate
+from instrument.env_param import EngineMethod, EngineParam, EnvParam
+from instrument.market import Market, load_market
 
 
 class InstParam(Enum):
@@ -16,6 +17,7 @@ class InstParam(Enum):
     OptionType = 'OptionType'
     OptionStrike = 'OptionStrike'
     OptionMaturity = 'OptionMaturity'
+    OptionAmerican = 'OptionAmerican'
 
 
 class InstType(Enum):
@@ -32,15 +34,14 @@ class Instrument(object):
     """
     financial instrument class
     use class method - get_inst to get correct type of instrument
+    terms are validated once at creation, pricing reads the slots directly
     """
+    __slots__ = ('_type', '_unit', '_price')
     _name = "instrument"
-    _inst_dict = None
-    _type = None
-    _unit = None
-    _price = None
 
     def __init__(self, inst_dict_):
-        self._inst_dict = inst_dict_
+        self._unit = None
+        self._price = None
         self.type = inst_dict_.get(InstParam.InstType.value)
         self.unit = inst_dict_.get(InstParam.InstUnit.value)
         self.price = inst_dict_.get(InstParam.InstCost.value)
@@ -61,6 +62,10 @@ class Instrument(object):
         if type_ is None:
             raise ValueError("instrument type not specified")
 
+    def terms(self):
+        """hashable pricing terms, cost is not included since it only shifts PnL"""
+        return type(self).__name__, self._type, self._unit
+
     def payoff(self, mkt_dict_):
         """get instrument payoff for given spot"""
         raise NotImplementedError("'payoff' method need to be defined in sub-classes")
@@ -90,11 +95,41 @@ class Instrument(object):
         """evaluate instrument GAMMA with market data and engine"""
         raise NotImplementedError("'gamma' method need to be defined in sub-classes")
 
+    def vega(self, mkt_dict_, engine_, unit_=None):
+        """evaluate instrument VEGA per volatility point with market data and engine"""
+        raise NotImplementedError("'vega' method need to be defined in sub-classes")
+
+    def theta(self, mkt_dict_, engine_, unit_=None):
+        """evaluate instrument THETA per year with market data and engine"""
+        raise NotImplementedError("'theta' method need to be defined in sub-classes")
+
+    def rho(self, mkt_dict_, engine_, unit_=None):
+        """evaluate instrument RHO per rate point with market data and engine"""
+        raise NotImplementedError("'rho' method need to be defined in sub-classes")
+
+    def vanna(self, mkt_dict_, engine_, unit_=None):
+        """evaluate instrument VANNA (DELTA per volatility point) with market data and engine"""
+        raise NotImplementedError("'vanna' method need to be defined in sub-classes")
+
+    def volga(self, mkt_dict_, engine_, unit_=None):
+        """evaluate instrument VOLGA (VEGA per volatility point) with market data and engine"""
+        raise NotImplementedError("'volga' method need to be defined in sub-classes")
+
+    def risk(self, mkt_dict_, engine_, unit_=None):
+        """evaluate instrument PV, DELTA and GAMMA together with market data and engine"""
+        return self.pv(mkt_dict_, engine_, unit_), self.delta(mkt_dict_, engine_, unit_), \
+            self.gamma(mkt_dict_, engine_, unit_)
+
+    def mc_path_value(self, mkt_dict_, engine_, rand_, value_type_='pv', unit_=None):
+        """
+        Monte-Carlo value of each simulated path, in shape of (spots, paths) for an array of spots
+        instruments without optionality have the same value on every path
+        """
+        return array(self.__getattribute__(value_type_)(mkt_dict_, engine_, unit_), dtype=float)[..., None]
+
     @property
     def type(self):
         """instrument type"""
-        if self._type is None:
-            raise ValueError("{} type not specified".format(self._name))
         return self._type
 
     @type.setter
@@ -133,18 +168,6 @@ class Instrument(object):
 
     @staticmethod
     def _load_market(mkt_dict_, load_param_):
-        _res = []
-        for _param in load_param_:
-            _value = mkt_dict_.get(_param)
-            if _param in [EnvParam.RiskFreeRate.value, EnvParam.UdVolatility.value, EnvParam.UdDivYieldRatio.value]:
-                if not isinstance(_value, (int, float)):
-                    raise ValueError("type <int> or <float> is required for {}, not {}".format(_param, type(_value)))
-                _value /= 100
-            if _param in [EnvParam.RiskFreeRate.value, EnvParam.UdDivYieldRatio.value]:
-                _rate_format = mkt_dict_.get(EnvParam.RateFormat.value)
-                if _rate_format not in [_r.value for _r in RateFormat]:
-                    raise ValueError("invalid rate type given: {}".format(_rate_format))
-                if _rate_format == RateFormat.Single.value:
-                    _value = to_continuous_rate(_value)
-            _res.append(_value)
-        return _res
+        if isinstance(mkt_dict_, Market):
+            return [mkt_dict_.get(_param) for _param in load_param_]
+        return load_market(mkt_dict_, load_param_)
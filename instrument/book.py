@@ -0,0 +1,344 @@
+# coding=utf-8
+"""definition of columnar option book for batch pricing"""
+
+from instrument import InstParam, InstType, Instrument
+from instrument.env_param import EngineMethod, EnvParam, VarReduction
+from instrument.market import Market
+from functools import partial
+from instrument.option import Option, american_engine, american_error
+from numpy import array, empty, maximum, nan, ndim, ones_like, sort, stack, unique, zeros, zeros_like
+from utils.black_scholes import BlackScholes, ImpliedVolStatus, greek_list, greek_scale
+from utils.finite_difference import FiniteDifference
+from utils.lattice import Lattice
+from utils.monte_carlo import MonteCarlo
+
+type_sign = {
+    InstType.CallOption.value: 1,
+    InstType.PutOption.value: -1,
+    InstType.Stock.value: 0,
+}
+
+# Monte-Carlo, tree and PDE greeks beyond DELTA and GAMMA are differences of revaluations (Monte-Carlo on the same
+# draws), bumped by volatility and rate (decimals) and calendar time (years)
+mc_vol_bump = 0.01
+mc_rate_bump = 1e-4
+mc_time_bump = 1 / 365
+
+
+class Book(object):
+    """
+    option book held as struct-of-arrays
+    every leg is a position in numpy arrays of type sign, strike, maturity, unit, cost and early exercise flag,
+    so a whole book is priced in one vectorized call per engine instead of a loop over instrument objects
+    type sign is 1 for call, -1 for put and 0 for stock, legs are European unless american_ is given
+    legs are named by label_ (e.g. component names in profiling reports), or by their position if not given
+    """
+    def __init__(self, sign_, strike_, maturity_, unit_, cost_, american_=None, label_=None):
+        self.sign = array(sign_, dtype=int)
+        self.strike = array(strike_, dtype=float)
+        self.maturity = array(maturity_, dtype=float)
+        self.unit = array(unit_, dtype=float)
+        self.cost = array(cost_, dtype=float)
+        self.american = zeros(self.sign.shape, dtype=bool) if american_ is None else array(american_, dtype=bool)
+        if not (self.sign.shape == self.strike.shape == self.maturity.shape == self.unit.shape == self.cost.shape ==
+                self.american.shape):
+            raise ValueError("all book columns should have same length")
+        if (self.maturity < 0).any():
+            raise ValueError("non-negative value is required for maturity")
+        self.label = [str(_idx) for _idx in range(self.sign.size)] if label_ is None else [str(_l) for _l in label_]
+        if len(self.label) != self.sign.size:
+            raise ValueError("all book columns should have same length")
+
+    def __len__(self):
+        return self.sign.size
+
+    @classmethod
+    def from_components(cls, inst_list_):
+        """build book from instrument objects"""
+        _sign = [type_sign[_inst.type] for _inst in inst_list_]
+        return cls(_sign, [_inst.strike if _s else 0 for _inst, _s in zip(inst_list_, _sign)],
+                   [_inst.maturity if _s else 0 for _inst, _s in zip(inst_list_, _sign)],
+                   [_inst.unit for _inst in inst_list_], [_inst.price for _inst in inst_list_],
+                   [_inst.american if _s else False for _inst, _s in zip(inst_list_, _sign)],
+                   [str(_inst) for _inst in inst_list_])
+
+    @classmethod
+    def from_param(cls, inst_list_):
+        """build book from a list of instrument dictionaries (InstParam keys)"""
+        _column = {_key: [] for _key in ['sign', 'strike', 'maturity', 'unit', 'cost', 'american']}
+        for _inst in inst_list_:
+            _type = _inst.get(InstParam.InstType.value)
+            if _type not in type_sign:
+                raise ValueError("invalid instrument type given: {}".format(_type))
+            _column['sign'].append(type_sign[_type])
+            _column['strike'].append(_inst.get(InstParam.OptionStrike.value) if type_sign[_type] else 0)
+            _column['maturity'].append(_inst.get(InstParam.OptionMaturity.value) if type_sign[_type] else 0)
+            _column['unit'].append(_inst.get(InstParam.InstUnit.value))
+            _column['cost'].append(_inst.get(InstParam.InstCost.value))
+            _column['american'].append(_inst.get(InstParam.OptionAmerican.value, False) if type_sign[_type] else False)
+
+        for _key, _value in _column.items():
+            if any([not isinstance(_v, (int, float)) for _v in _value]):
+                raise ValueError("type <int> or <float> is required for all {} values".format(_key))
+        return cls(**{'{}_'.format(_key): _value for _key, _value in _column.items()})
+
+    def pv(self, mkt_dict_, engine_):
+        """PV of each leg, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['pv'])[0]
+
+    def delta(self, mkt_dict_, engine_):
+        """DELTA of each leg, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['delta'])[0]
+
+    def gamma(self, mkt_dict_, engine_):
+        """GAMMA of each leg, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['gamma'])[0]
+
+    def vega(self, mkt_dict_, engine_):
+        """VEGA of each leg per volatility point, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['vega'])[0]
+
+    def theta(self, mkt_dict_, engine_):
+        """THETA of each leg per year, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['theta'])[0]
+
+    def rho(self, mkt_dict_, engine_):
+        """RHO of each leg per rate point, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['rho'])[0]
+
+    def vanna(self, mkt_dict_, engine_):
+        """VANNA of each leg (DELTA per volatility point), times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['vanna'])[0]
+
+    def volga(self, mkt_dict_, engine_):
+        """VOLGA of each leg (VEGA per volatility point), times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['volga'])[0]
+
+    def risk(self, mkt_dict_, engine_):
+        """PV, DELTA and GAMMA of each leg together, times leg unit"""
+        return self._evaluate(mkt_dict_, engine_, ['pv', 'delta', 'gamma'])
+
+    def greeks(self, mkt_dict_, engine_, greek_=None):
+        """PV and greeks of given names (default all of greek_list) of each leg together as a dict, times leg unit"""
+        _greek = greek_list if greek_ is None else list(greek_)
+        return dict(zip(_greek, self._evaluate(mkt_dict_, engine_, _greek)))
+
+    def pnl(self, mkt_dict_, engine_):
+        """PnL of each leg"""
+        return self.pv(mkt_dict_, engine_) - self.cost * self.unit
+
+    def implied_vol(self, mkt_dict_, price_=None):
+        """
+        Black-Scholes implied volatility (in percent, as UdVolatility) of each leg quoted at price_ per unit,
+        cost of each leg by default, solved for all legs together (see BlackScholes.implied_vol)
+        :return: volatility (nan if not solved) and ImpliedVolStatus value of each leg, stocks are Invalid and
+        American options are American
+        """
+        _load_param = [EnvParam.RiskFreeRate.value, EnvParam.UdSpotForPrice.value, EnvParam.UdDivYieldRatio.value]
+        _rate, _spot, _div = tuple(Instrument._load_market(mkt_dict_, _load_param))
+        _price = self.cost if price_ is None else array(price_, dtype=float)
+        _vol, _status = BlackScholes.implied_vol(self.sign, _price, _spot, self.strike, rate=_rate, div=_div,
+                                                 t=self.maturity)
+        _status[self.american] = ImpliedVolStatus.American.value
+        _status[self.sign == 0] = ImpliedVolStatus.Invalid.value
+        _vol[_status != ImpliedVolStatus.Solved.value] = nan
+        return _vol * 100, _status
+
+    def surface(self, mkt_dict_, engine_, value_type_, vol_=None, elapsed_=None):
+        """
+        total value of given type ('pnl' or one of greek_list) over spots and one more market axis,
+        either volatilities vol_ (decimals) or elapsed time elapsed_ (years, legs expire when it reaches maturity)
+        result is in shape of (grid, spots), summed over legs and times leg unit
+        Black-Scholes evaluates the whole grid in one broadcast call, other engines price grid points one by one
+        (Monte-Carlo with one set of draws)
+        """
+        if value_type_ not in ['pnl'] + greek_list:
+            raise ValueError("invalid surface value type given: {}".format(value_type_))
+        if (vol_ is None) == (elapsed_ is None):
+            raise ValueError("either volatility or elapsed time grid is required for surface")
+        _mkt = Market.from_dict(mkt_dict_)
+        _grid = array(vol_ if vol_ is not None else elapsed_, dtype=float).ravel()
+        _spot = array(_mkt.get(EnvParam.UdSpotForPrice.value), dtype=float).ravel()
+        _func = 'pv' if value_type_ == 'pnl' else value_type_
+        _method, _param = Option._load_engine(engine_)
+
+        if _method != EngineMethod.BS.value:
+            # every grid point is priced with the same sorted draws, so the surface is smooth along both axes
+            _engine = dict(engine_, rand=self._sorted_rand(engine_, _param)) \
+                if _method == EngineMethod.MC.value else engine_
+            _res = []
+            for _z in _grid:
+                _book, _mkt_z = self, _mkt.with_spot(_spot)
+                if vol_ is not None:
+                    _mkt_z = _mkt_z.with_value(EnvParam.UdVolatility.value, _z)
+                else:
+                    _book = Book(self.sign, self.strike, maximum(self.maturity - _z, 0), self.unit, self.cost,
+                                 self.american, self.label)
+                _res.append(getattr(_book, value_type_)(_mkt_z, _engine).sum(axis=-1))
+            return array(_res, dtype=float).reshape(_grid.size, _spot.size)
+
+        self._check_american(_method)
+        # grid along first axis, spots along second and option legs along last
+        _rate, _div = _mkt.get(EnvParam.RiskFreeRate.value), _mkt.get(EnvParam.UdDivYieldRatio.value)
+        _option, _stock = self.sign != 0, self.sign == 0
+        _vol = _grid[:, None, None] if vol_ is not None else _mkt.get(EnvParam.UdVolatility.value)
+        _t = self.maturity[_option] if vol_ is not None else \
+            maximum(self.maturity[_option] - _grid[:, None, None], 0)
+        _value = BlackScholes.greeks(self.sign[_option], _spot[None, :, None], self.strike[_option], [_func],
+                                     rate=_rate, div=_div, vol=_vol, t=_t)[0] @ self.unit[_option]
+        _stock_unit = self.unit[_stock].sum()
+        _value = _value * greek_scale.get(_func, 1) + {'pv': _spot * _stock_unit, 'delta': _stock_unit}.get(_func, 0)
+        if value_type_ == 'pnl':
+            _value = _value - self.cost @ self.unit
+        return (_value * ones_like(_grid)[:, None] * ones_like(_spot)).astype(float)
+
+    def stress(self, mkt_dict_, engine_, scenario_):
+        """
+        stress PnL of each leg under each scenario of a ScenarioSet, i.e. leg PV on shocked market less leg PV on
+        given market, times leg unit, in shape of (scenarios, legs)
+        Black-Scholes revalues all scenarios in one broadcast call, other engines price scenarios sharing the same
+        volatility, rate, dividend and time shocks together as an array of spots (Monte-Carlo with one set of draws)
+        """
+        _mkt = Market.from_dict(mkt_dict_)
+        _rate, _spot, _vol, _div = [_mkt.get(_param) for _param in [
+            EnvParam.RiskFreeRate.value, EnvParam.UdSpotForPrice.value, EnvParam.UdVolatility.value,
+            EnvParam.UdDivYieldRatio.value]]
+        _spot = _spot * (1 + scenario_.spot / 100)
+        _vol, _rate, _div = _vol + scenario_.vol / 100, _rate + scenario_.rate / 100, _div + scenario_.div / 100
+        if (_vol <= 0).any():
+            raise ValueError("positive value is required for shocked volatility")
+        _method, _param = Option._load_engine(engine_)
+        if _method == EngineMethod.MC.value:
+            engine_ = dict(engine_, rand=self._sorted_rand(engine_, _param))
+        _base = self.pv(_mkt, engine_)
+
+        if _method != EngineMethod.BS.value:
+            _res = empty((len(scenario_), len(self)))
+            _shock, _group = unique(stack([_vol, _rate, _div, scenario_.time], axis=1), axis=0, return_inverse=True)
+            for _idx, (_vol_g, _rate_g, _div_g, _time_g) in enumerate(_shock):
+                _member = _group.ravel() == _idx
+                _mkt_g = _mkt.with_spot(_spot[_member]).with_value(EnvParam.UdVolatility.value, _vol_g) \
+                    .with_value(EnvParam.RiskFreeRate.value, _rate_g).with_value(EnvParam.UdDivYieldRatio.value, _div_g)
+                _book = Book(self.sign, self.strike, maximum(self.maturity - _time_g, 0), self.unit, self.cost,
+                             self.american, self.label)
+                _res[_member] = _book.pv(_mkt_g, engine_)
+            return _res - _base
+
+        # scenarios along first axis and legs along second
+        _option = self.sign != 0
+        _res = _spot[:, None] * ones_like(self.strike)
+        _res[:, _option] = BlackScholes.pv(
+            self.sign[_option], _spot[:, None], self.strike[_option], rate=_rate[:, None], div=_div[:, None],
+            vol=_vol[:, None], t=maximum(self.maturity[_option] - scenario_.time[:, None], 0))
+        return _res * self.unit - _base
+
+    def _evaluate(self, mkt_dict_, engine_, value_type_):
+        """
+        evaluate given value types of all legs
+        result arrays are in shape of (legs, ) for a scalar spot, or (spots, legs) for an array of spots
+        """
+        _load_param = [EnvParam.RiskFreeRate.value, EnvParam.UdSpotForPrice.value, EnvParam.UdVolatility.value,
+                       EnvParam.UdDivYieldRatio.value]
+        _rate, _spot, _vol, _div = tuple(Instrument._load_market(mkt_dict_, _load_param))
+        _method, _param = Option._load_engine(engine_)
+        self._check_american(_method)
+        _spot = array(_spot, dtype=float)[..., None] if ndim(_spot) else float(_spot)
+        _option = self.sign != 0
+        # stocks are worth spot, with DELTA 1 and no other greeks
+        _res = {_type: {'pv': _spot, 'delta': 1}.get(_type, 0) + zeros_like(_spot * self.strike)
+                for _type in value_type_}
+
+        # legs are priced by maturity bucket, so discount factors and sqrt(t) terms are shared within a bucket
+        # expired legs (zero maturity) are worth their intrinsic value under every engine
+        _bs_bucket = [_t for _t in unique(self.maturity[_option]) if _method == EngineMethod.BS.value or _t == 0]
+        for _t in _bs_bucket:
+            _bucket = _option & (self.maturity == _t)
+            _value = BlackScholes.greeks(self.sign[_bucket], _spot, self.strike[_bucket], value_type_, rate=_rate,
+                                         div=_div, vol=_vol, t=_t)
+            for _type, _v in zip(value_type_, _value):
+                _res[_type][..., _bucket] = _v
+
+        _live = _option & (self.maturity > 0)
+        if _method != EngineMethod.BS.value and _live.any():
+            _pricer = self._bucket_pricer(_method, _param, engine_)
+            for _t in unique(self.maturity[_live]):
+                _bucket = _live & (self.maturity == _t)
+                _func = _pricer(self.sign[_bucket], _spot, self.strike[_bucket], self.american[_bucket], _vol, _t)
+                _value = self._bump_greeks(_func, self.sign[_bucket], _spot, self.strike[_bucket], value_type_,
+                                           rate=_rate, div=_div, vol=_vol, t=_t)
+                for _type in value_type_:
+                    _res[_type][..., _bucket] = _value[_type]
+
+        return tuple([_res[_type] * self.unit * greek_scale.get(_type, 1) for _type in value_type_])
+
+    @staticmethod
+    def _bucket_pricer(method_, param_, engine_):
+        """
+        pricer of options of one maturity under given engine, called with sign, spot, strike, early exercise flag,
+        volatility and maturity, it returns func_ of _bump_greeks
+        Monte-Carlo prices all buckets on the same sorted draws, reusing path sums kept in engine 'sums' if given,
+        tree engine rolls back all legs of a bucket together
+        on trees of the same shape, PDE engine solves all legs of a bucket on one grid, so each time step is one
+        banded solve for every spot of every leg, and bumped revaluations keep the grid of given market
+        (PDE spot steps of engine are a minimum, more are used for wide grids, see FiniteDifference.spot_steps)
+        """
+        _rand, _control, _steps = None, False, ()
+        if method_ == EngineMethod.MC.value:
+            _rand = Book._sorted_rand(engine_, param_)
+            _control = Option._mc_var_reduction(param_) == VarReduction.ControlVariate.value
+        elif method_ == EngineMethod.Tree.value:
+            _steps = Option._tree_param(param_)
+        else:
+            _steps = Option._pde_param(param_)
+
+        def _pricer(sign_, spot_, strike_, american_, vol_, t_):
+            if method_ == EngineMethod.MC.value:
+                return partial(MonteCarlo.vanilla, sign_, spot_, strike_, _rand, _control, sums_=engine_.get('sums'))
+            if method_ == EngineMethod.Tree.value:
+                return partial(Lattice.price, sign_, spot_, strike_, american_, *_steps)
+            return partial(FiniteDifference.price, sign_, spot_, strike_, american_, *_steps,
+                           top_=FiniteDifference.grid_top(spot_, strike_, vol_, t_), fixed_=False)
+        return _pricer
+
+    @staticmethod
+    def _sorted_rand(engine_, param_):
+        """
+        Monte-Carlo draws of engine sorted ascending, or new sorted draws if not attached
+        draws attached already sorted (see Portfolio._curve_engine) are used as they are
+        """
+        _rand = engine_.get('rand')
+        if _rand is None:
+            return sort(Option._mc_normal(param_))
+        return _rand if (_rand[1:] >= _rand[:-1]).all() else sort(_rand)
+
+    def _check_american(self, method_):
+        if method_ not in american_engine and (self.american & (self.maturity > 0)).any():
+            raise ValueError(american_error)
+
+    @staticmethod
+    def _bump_greeks(func_, sign_, spot_, strike_, value_type_, **kwargs):
+        """
+        Monte-Carlo, tree or PDE PV and greeks of given types for options of one maturity, as a dict by type
+        func_ gives PV, DELTA and GAMMA in one pass for market keywords (see MonteCarlo.vanilla, Lattice.price and
+        FiniteDifference.price), other greeks are differences of its revaluations bumped by volatility, rate or time
+        """
+        def _vanilla(**bump):
+            return func_(**dict(kwargs, **bump))
+
+        _vol, _rate, _t = kwargs['vol'], kwargs['rate'], kwargs['t']
+        _value = dict(zip(['pv', 'delta', 'gamma'], _vanilla()))
+        if {'vega', 'vanna', 'volga'} & set(value_type_):
+            _bump = min(mc_vol_bump, _vol / 2)
+            _up, _down = _vanilla(vol=_vol + _bump), _vanilla(vol=_vol - _bump)
+            _value['vega'] = (_up[0] - _down[0]) / 2 / _bump
+            _value['vanna'] = (_up[1] - _down[1]) / 2 / _bump
+            _value['volga'] = (_up[0] - 2 * _value['pv'] + _down[0]) / _bump ** 2
+        if 'rho' in value_type_:
+            _value['rho'] = (_vanilla(rate=_rate + mc_rate_bump)[0] - _vanilla(rate=_rate - mc_rate_bump)[0]) / 2 / \
+                mc_rate_bump
+        if 'theta' in value_type_:
+            # a day later, or at expiry for options expiring within a day
+            _bump = min(mc_time_bump, _t)
+            _later = _vanilla(t=_t - _bump)[0] if _t > _bump else BlackScholes.intrinsic(sign_, spot_, strike_)
+            _value['theta'] = (_later - _value['pv']) / _bump
+        return _value
@@ -0,0 +1,66 @@
+# coding=utf-8
+"""memoization of instrument pricing and portfolio curves"""
+
+from functools import wraps
+from instrument.env_param import EngineMethod, EngineParam
+from instrument.market import Market
+from utils.cache import LRUCache
+
+pricing_cache = LRUCache()
+
+# engine parameters which do not change pricing results
+engine_param_ignored = [EngineParam.MCWorkers.value]
+
+
+def engine_key(engine_):
+    """
+    hashable key of engine settings
+    None if results are not reproducible from settings, i.e. Monte-Carlo without seed, or with draws attached
+    through 'rand' (which could be any draws, and are too large to be hashed on each call)
+    """
+    _method = engine_.get('engine')
+    _param = engine_.get('param') or {}
+    if _method == EngineMethod.MC.value and (_param.get(EngineParam.MCSeed.value) is None or
+                                             engine_.get('rand') is not None):
+        return None
+    return _method, tuple(sorted([_item for _item in _param.items() if _item[0] not in engine_param_ignored]))
+
+
+def cached_pricing(func_):
+    """
+    cache decorator for instrument pricing methods
+    key combines method, instrument terms, unit, market snapshot and engine settings (including seed)
+    only calls with a market snapshot are cached, market dictionaries could be modified in place
+    """
+    @wraps(func_)
+    def _wrapper(self, mkt_dict_, engine_, unit_=None):
+        if not pricing_cache.enabled or not isinstance(mkt_dict_, Market):
+            return func_(self, mkt_dict_, engine_, unit_)
+        _engine_key = engine_key(engine_)
+        if _engine_key is None:
+            return func_(self, mkt_dict_, engine_, unit_)
+
+        _key = (func_.__name__, self.terms(), unit_, mkt_dict_.key(), _engine_key)
+        _hit, _value = pricing_cache.get(_key)
+        if _hit:
+            return _value
+        return pricing_cache.put(_key, func_(self, mkt_dict_, engine_, unit_))
+    return _wrapper
+
+
+def cached_curve(func_):
+    """
+    cache decorator for portfolio curve generator
+    key is given by the portfolio (components terms, market snapshot, engine settings and curve settings)
+    """
+    @wraps(func_)
+    def _wrapper(self, type_, margin_=20, step_=1, full_=False, progress_=None):
+        _key = self._curve_key(type_, margin_, step_, full_) if pricing_cache.enabled else None
+        if _key is None:
+            return func_(self, type_, margin_, step_, full_, progress_)
+
+        _hit, _value = pricing_cache.get(_key)
+        if _hit:
+            return _value
+        return pricing_cache.put(_key, func_(self, type_, margin_, step_, full_, progress_))
+    return _wrapper
@@ -1,9 +1,10 @@
 # coding=utf-8
 """default value of all parameters"""
 
-from gui.plot import PlotParam
+from copy import deepcopy
 from instrument import InstParam, InstType
-from instrument.env_param import EnvParam, EngineMethod, EngineParam, RateFormat
+from instrument.env_param import EnvParam, EngineMethod, EngineParam, PlotParam, RateFormat, TreeType, \
+    VarReduction
 
 
 default_param = {
@@ -11,12 +12,16 @@ default_param = {
         InstParam.InstUnit.value: 1,
         InstParam.InstCost.value: 0,
         InstParam.OptionStrike.value: EnvParam.UdSpotForPrice.value,
+        InstParam.OptionMaturity.value: EnvParam.PortMaturity.value,
+        InstParam.OptionAmerican.value: False,
         PlotParam.Show.value: False,
     },
     InstType.PutOption.value: {
         InstParam.InstUnit.value: 1,
         InstParam.InstCost.value: 0,
         InstParam.OptionStrike.value: EnvParam.UdSpotForPrice.value,
+        InstParam.OptionMaturity.value: EnvParam.PortMaturity.value,
+        InstParam.OptionAmerican.value: False,
         PlotParam.Show.value: False,
     },
     InstType.Stock.value: {
@@ -38,4 +43,21 @@ env_default_param = {
     EnvParam.RateFormat.value: RateFormat.Single.value,
     EnvParam.PricingEngine.value: EngineMethod.BS.value,
     EngineParam.MCIteration.value: 1000000,
+    EngineParam.MCVarReduction.value: VarReduction.Plain.value,
+    EngineParam.MCSeed.value: 0,
+    EngineParam.MCWorkers.value: 1,
+    EngineParam.TreeSteps.value: 200,
+    EngineParam.TreeType.value: TreeType.Binomial.value,
+    EngineParam.PDESpotSteps.value: 500,
+    EngineParam.PDETimeSteps.value: 200,
 }
+
+
+def parse_env(env_param_):
+    """parse environment data into market, engine, and rounding"""
+    _mkt = deepcopy(env_param_)
+    _engine = dict(engine=_mkt.pop(EnvParam.PricingEngine.value), param={})
+    for _engine_param in [_param.value for _param in EngineParam]:
+        _engine['param'][_engine_param] = _mkt.pop(_engine_param, env_default_param[_engine_param])
+    _rounding = _mkt.pop(EnvParam.CostRounding.value)
+    return _mkt, _engine, _rounding
@@ -1,5 +1,5 @@
 # coding=utf-8
-"""market and engine parameters"""
+"""market, engine and plotting parameters"""
 
 from enum import Enum
 
@@ -26,8 +26,35 @@ class EngineMethod(Enum):
     """engine evaluation method"""
     BS = 'Black-Scholes'
     MC = 'Monte-Carlo'
+    Tree = 'Tree'
+    PDE = 'PDE'
 
 
 class EngineParam(Enum):
     """engine parameter"""
     MCIteration = 'MCIteration'
+    MCVarReduction = 'MCVarReduction'
+    MCSeed = 'MCSeed'
+    MCWorkers = 'MCWorkers'
+    TreeSteps = 'TreeSteps'
+    TreeType = 'TreeType'
+    PDESpotSteps = 'PDESpotSteps'
+    PDETimeSteps = 'PDETimeSteps'
+
+
+class VarReduction(Enum):
+    """Monte-Carlo variance reduction method"""
+    Plain = 'None'
+    Antithetic = 'Antithetic'
+    ControlVariate = 'Control Variate'
+
+
+class TreeType(Enum):
+    """lattice type of tree engine"""
+    Binomial = 'Binomial'
+    Trinomial = 'Trinomial'
+
+
+class PlotParam(Enum):
+    """plotting parameters"""
+    Show = 'Show'
@@ -0,0 +1,79 @@
+# coding=utf-8
+"""definition of market snapshot for pricing"""
+
+from instrument.env_param import EnvParam, RateFormat
+from types import MappingProxyType
+from utils import to_continuous_rate
+
+market_param = [EnvParam.RiskFreeRate.value, EnvParam.UdVolatility.value, EnvParam.UdDivYieldRatio.value,
+                EnvParam.UdSpotForPrice.value, EnvParam.PortMaturity.value]
+
+
+def load_market(mkt_dict_, load_param_):
+    """load market parameters from market dictionary, percentages to decimals and rates to continuous rates"""
+    _res = []
+    for _param in load_param_:
+        _value = mkt_dict_.get(_param)
+        if _param in [EnvParam.RiskFreeRate.value, EnvParam.UdVolatility.value, EnvParam.UdDivYieldRatio.value]:
+            if not isinstance(_value, (int, float)):
+                raise ValueError("type <int> or <float> is required for {}, not {}".format(_param, type(_value)))
+            _value /= 100
+        if _param in [EnvParam.RiskFreeRate.value, EnvParam.UdDivYieldRatio.value]:
+            _rate_format = mkt_dict_.get(EnvParam.RateFormat.value)
+            if _rate_format not in [_r.value for _r in RateFormat]:
+                raise ValueError("invalid rate type given: {}".format(_rate_format))
+            if _rate_format == RateFormat.Single.value:
+                _value = to_continuous_rate(_value)
+        _res.append(_value)
+    return _res
+
+
+class Market(object):
+    """
+    validated and frozen market snapshot
+    parsed once from a market dictionary: percentages are decimals and rates are continuous rates already,
+    pricing functions accept it in place of the market dictionary
+    """
+    __slots__ = ('_value', )
+
+    def __init__(self, value_):
+        object.__setattr__(self, '_value', MappingProxyType(dict(value_)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("market snapshot is immutable")
+
+    def __reduce__(self):
+        return Market, (dict(self._value), )
+
+    def __repr__(self):
+        return "Market({})".format(dict(self._value))
+
+    @classmethod
+    def from_dict(cls, mkt_dict_):
+        """parse and validate market dictionary into snapshot"""
+        if isinstance(mkt_dict_, Market):
+            return mkt_dict_
+        _spot = mkt_dict_.get(EnvParam.UdSpotForPrice.value)
+        if _spot is not None and not isinstance(_spot, (int, float)):
+            raise ValueError("type <int> or <float> is required for {}, not {}".format(
+                EnvParam.UdSpotForPrice.value, type(_spot)))
+        return cls(zip(market_param, load_market(mkt_dict_, market_param)))
+
+    def key(self):
+        """hashable key of snapshot, spot arrays are keyed by their content"""
+        return tuple([(_param, (_value.shape, _value.tobytes()) if hasattr(_value, 'tobytes') else _value)
+                      for _param, _value in sorted(self._value.items())])
+
+    def get(self, param_, default_=None):
+        """get parsed market parameter"""
+        return self._value.get(param_, default_)
+
+    def with_spot(self, spot_):
+        """copy of snapshot with a different spot, which could be a numpy array of spots"""
+        return self.with_value(EnvParam.UdSpotForPrice.value, spot_)
+
+    def with_value(self, param_, value_):
+        """copy of snapshot with a different value of one parsed parameter, e.g. volatility as decimal"""
+        _value = dict(self._value)
+        _value[param_] = value_
+        return Market(_value)
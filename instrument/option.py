@@ -2,98 +2,222 @@
 """definition of option for payoff estimation and pricing"""
 
 from instrument import InstParam, InstType, Instrument, option_type
-from instrument.env_param import EngineMethod, EngineParam, EnvParam
-from numpy import average, pi
-from numpy.ma import exp, log, sqrt
-from scipy.stats import norm
+from instrument.cache import cached_pricing
+from instrument.env_param import EngineMethod, EngineParam, EnvParam, TreeType, VarReduction
+from numpy import array, errstate, exp, maximum, ndim, sqrt, where
+from utils.black_scholes import BlackScholes, ImpliedVolStatus, greek_scale
+from utils.lattice import binomial_min_steps, trinomial_min_steps
+from utils.monte_carlo import MonteCarlo
+
+
+implied_vol_error = {
+    ImpliedVolStatus.OutOfBound.value: "price outside no-arbitrage bounds, or too close to them",
+    ImpliedVolStatus.Invalid.value: "expired option, or non-positive spot or strike",
+    ImpliedVolStatus.NotConverged.value: "solver did not converge",
+    ImpliedVolStatus.American.value: "American option, Black-Scholes does not price early exercise",
+}
+
+# engines pricing options as a one-leg book, and engines supporting early exercise
+book_engine = [EngineMethod.MC.value, EngineMethod.Tree.value, EngineMethod.PDE.value]
+american_engine = [EngineMethod.Tree.value, EngineMethod.PDE.value]
+
+american_error = "American options are only priced by {} engine".format(" or ".join(american_engine))
 
 
 class Option(Instrument):
     """
     option class with basic parameters
-    only vanilla option is available (barrier is not supported)
+    only vanilla option is available (barrier is not supported), exercised at maturity or at any time (American)
     can estimate option payoff under different level of spot
     can evaluate option price under different market using different evaluation engine
     """
+    __slots__ = ('_strike', '_maturity', '_american')
     _name = "option"
-    _strike = None
-    _maturity = None
 
     def __init__(self, inst_dict_):
         super(Option, self).__init__(inst_dict_)
         self.strike = inst_dict_[InstParam.OptionStrike.value]
         self.maturity = inst_dict_[InstParam.OptionMaturity.value]
+        self.american = inst_dict_.get(InstParam.OptionAmerican.value, False)
 
     def __str__(self):
-        return "{} * {} {}, Maturity {}".format(self.unit, self.strike, self.type, self.maturity)
+        return "{} * {} {}{}, Maturity {}".format(self.unit, self.strike, "American " if self.american else "",
+                                                  self.type, self.maturity)
+
+    def terms(self):
+        """hashable option pricing terms"""
+        return super(Option, self).terms() + (self._strike, self._maturity, self._american)
 
     def payoff(self, mkt_dict_):
-        """get option payoff for given spot"""
+        """get option payoff for given spot (scalar or numpy array)"""
         _spot = self._load_market(mkt_dict_, [EnvParam.UdSpotForPrice.value])[0]
-        _reference = _spot - self.strike if self.type == InstType.CallOption.value else self.strike - _spot
-        return max([_reference, 0]) * self.unit
+        _reference = _spot - self._strike if self._type == InstType.CallOption.value else self._strike - _spot
+        return maximum(_reference, 0) * self.unit
 
+    @cached_pricing
     def pv(self, mkt_dict_, engine_, unit_=None):
         """calculate option PV with market data and engine"""
         _rate, _spot, _vol, _div, _method, _param, _sign, _strike, _t = self._prepare_risk_data(mkt_dict_, engine_)
         _unit = unit_ or self.unit
 
         if _method == EngineMethod.BS.value:
-            _d1 = (log(_spot / _strike) + (_rate - _div + _vol ** 2 / 2) * _t) / _vol / sqrt(_t)
-            _d2 = _d1 - _vol * sqrt(_t)
-            return _sign * (_spot * exp(-_div * _t) * norm.cdf(_sign * _d1) -
-                            _strike * exp(-_rate * _t) * norm.cdf(_sign * _d2)) * _unit
+            return BlackScholes.pv(_sign, _spot, _strike, rate=_rate, div=_div, vol=_vol, t=_t) * _unit
 
         elif _method == EngineMethod.MC.value:
-            from utils.monte_carlo import MonteCarlo
-            _iteration = self._check_iter(_param[EngineParam.MCIteration.value])
-            _spot = MonteCarlo.stock_price(_iteration, isp=_spot, rate=_rate, div=_div, vol=_vol, t=_t)
-            _price = [max(_sign * (_s - _strike), 0) for _s in _spot]
-            return average(_price) * exp(-_rate * _t) * _unit
+            _growth = self._mc_growth(engine_, _param, _rate, _div, _vol, _t)
+            _control = self._mc_var_reduction(_param) == VarReduction.ControlVariate.value
+            _forward = exp((_rate - _div) * _t)
+
+            def _price(_path):
+                _payoff = maximum(_sign * (_path - _strike), 0)
+                return MonteCarlo.control_variate(_payoff, _growth, _forward) if _control else _payoff.mean()
+            return self._mc_map(_price, _spot, _growth) * exp(-_rate * _t) * _unit
 
+        elif _method in american_engine:
+            return self._greek('pv', mkt_dict_, engine_, unit_)
+
+    @cached_pricing
     def delta(self, mkt_dict_, engine_, unit_=None):
-        """calculate option DELTA with market data and engine"""
+        """calculate option DELTA with market data and engine, Monte-Carlo uses the pathwise estimator as in risk"""
         _rate, _spot, _vol, _div, _method, _param, _sign, _strike, _t = self._prepare_risk_data(mkt_dict_, engine_)
         _unit = unit_ or self.unit
 
-        if _method == EngineMethod.BS.value:
-            _d1 = (log(_spot / _strike) + (_rate + _vol ** 2 / 2) * _t) / _vol / sqrt(_t)
-            return _sign * norm.cdf(_sign * _d1) * exp(-_div * _t) * _unit
+        if _method in [EngineMethod.BS.value] + american_engine:
+            return self._greek('delta', mkt_dict_, engine_, unit_)
 
         elif _method == EngineMethod.MC.value:
-            from utils.monte_carlo import MonteCarlo
-            _iteration = self._check_iter(_param[EngineParam.MCIteration.value])
-            _spot = MonteCarlo.stock_price(_iteration, isp=_spot, rate=_rate, div=_div, vol=_vol, t=_t)
-            _step = 0.01
-            _delta = [(max(_sign * (_s + _step - _strike), 0) - max(_sign * (_s - _step - _strike), 0)) /
-                      (_step * 2) for _s in _spot]
-            return average(_delta) * exp(-_rate * _t) * _unit
+            _growth = self._mc_growth(engine_, _param, _rate, _div, _vol, _t)
 
+            def _delta(_path):
+                return _sign * (_growth * (_sign * (_path - _strike) > 0)).mean()
+            return self._mc_map(_delta, _spot, _growth) * exp(-_rate * _t) * _unit
+
+    @cached_pricing
     def gamma(self, mkt_dict_, engine_, unit_=None):
-        """calculate option GAMMA with market data and engine"""
+        """
+        calculate option GAMMA with market data and engine
+        Monte-Carlo uses the pathwise / likelihood-ratio estimator as in risk
+        """
         _rate, _spot, _vol, _div, _method, _param, _sign, _strike, _t = self._prepare_risk_data(mkt_dict_, engine_)
         _unit = unit_ or self.unit
 
-        if _method == EngineMethod.BS.value:
-            _d1 = (log(_spot / _strike) + (_rate + _vol ** 2 / 2) * _t) / _vol / sqrt(_t)
-            return exp(-_d1 ** 2 / 2) / sqrt(2 * pi) / _spot / _vol / sqrt(_t) * exp(-_div * _t) * _unit
+        if _method in [EngineMethod.BS.value] + american_engine:
+            return self._greek('gamma', mkt_dict_, engine_, unit_)
 
         elif _method == EngineMethod.MC.value:
-            from utils.monte_carlo import MonteCarlo
-            _iteration = self._check_iter(_param[EngineParam.MCIteration.value])
-            _spot = MonteCarlo.stock_price(_iteration, isp=_spot, rate=_rate, div=_div, vol=_vol, t=_t)
-            _step = 0.01
-            _gamma = [((max(_sign * (_s + 2 * _step - _strike), 0) - max(_sign * (_s - _strike), 0)) -
-                      (max(_sign * (_s - _strike), 0) - max(_sign * (_s - 2 * _step - _strike), 0))) /
-                      (4 * _step ** 2)
-                      for _s in _spot]
-            return average(_gamma) * exp(-_rate * _t) * _unit
+            _rand = self._mc_rand(engine_, _param)
+            _growth = MonteCarlo.stock_price(_rand.size, isp=1, rate=_rate, div=_div, vol=_vol, t=_t, rand=_rand)
+            _weight = _growth * (_rand / _vol / sqrt(_t) - 1)
+
+            def _gamma(_path):
+                return _sign * (_weight * (_sign * (_path - _strike) > 0)).mean()
+            with errstate(divide='ignore', invalid='ignore'):
+                return where(_spot > 0, self._mc_map(_gamma, _spot, _growth) / _spot, 0)[()] * exp(-_rate * _t) * \
+                    _unit
+
+    @cached_pricing
+    def vega(self, mkt_dict_, engine_, unit_=None):
+        """calculate option VEGA per volatility point with market data and engine"""
+        return self._greek('vega', mkt_dict_, engine_, unit_)
+
+    @cached_pricing
+    def theta(self, mkt_dict_, engine_, unit_=None):
+        """calculate option THETA per year with market data and engine"""
+        return self._greek('theta', mkt_dict_, engine_, unit_)
+
+    @cached_pricing
+    def rho(self, mkt_dict_, engine_, unit_=None):
+        """calculate option RHO per rate point with market data and engine"""
+        return self._greek('rho', mkt_dict_, engine_, unit_)
+
+    @cached_pricing
+    def vanna(self, mkt_dict_, engine_, unit_=None):
+        """calculate option VANNA (DELTA per volatility point) with market data and engine"""
+        return self._greek('vanna', mkt_dict_, engine_, unit_)
+
+    @cached_pricing
+    def volga(self, mkt_dict_, engine_, unit_=None):
+        """calculate option VOLGA (VEGA per volatility point) with market data and engine"""
+        return self._greek('volga', mkt_dict_, engine_, unit_)
+
+    @cached_pricing
+    def risk(self, mkt_dict_, engine_, unit_=None):
+        """
+        calculate option PV, DELTA and GAMMA together
+        Monte-Carlo uses one set of paths for all three: pathwise DELTA and pathwise / likelihood-ratio GAMMA
+        tree and PDE engines read all three off one tree or grid
+        """
+        _rate, _spot, _vol, _div, _method, _param, _sign, _strike, _t = self._prepare_risk_data(mkt_dict_, engine_)
+        _unit = unit_ or self.unit
+
+        if _method == EngineMethod.MC.value:
+            _rand = self._mc_rand(engine_, _param)
+            _growth = MonteCarlo.stock_price(_rand.size, isp=1, rate=_rate, div=_div, vol=_vol, t=_t, rand=_rand)
+            _score = _rand / _vol / sqrt(_t) - 1
+            _control = self._mc_var_reduction(_param) == VarReduction.ControlVariate.value
+            _forward = exp((_rate - _div) * _t)
+
+            def _risk(_spot):
+                _payoff = maximum(_sign * (_spot * _growth - _strike), 0)
+                _itm = _payoff > 0
+                _ratio = _growth[_itm]
+                _pv = MonteCarlo.control_variate(_payoff, _growth, _forward) if _control else _payoff.mean()
+                _gamma = _sign * (_ratio * _score[_itm]).sum() / _spot / _rand.size if _spot > 0 else 0
+                return _pv, _sign * _ratio.sum() / _rand.size, _gamma
+
+            if ndim(_spot):
+                _res = array([_risk(_s) for _s in _spot]).T
+            else:
+                _res = array(_risk(_spot))
+            _res *= exp(-_rate * _t) * _unit
+            return _res[0], _res[1], _res[2]
+
+        elif _method in american_engine:
+            return tuple([_v[..., 0] for _v in self._as_book(_unit).risk(mkt_dict_, engine_)])
+
+        return super(Option, self).risk(mkt_dict_, engine_, unit_)
+
+    def implied_vol(self, mkt_dict_, price_=None):
+        """Black-Scholes implied volatility in percent of option quoted at price_ (option price by default)"""
+        if self._american:
+            raise ValueError("no implied volatility for {}: {}".format(
+                self, implied_vol_error[ImpliedVolStatus.American.value]))
+        _load_param = [EnvParam.RiskFreeRate.value, EnvParam.UdSpotForPrice.value, EnvParam.UdDivYieldRatio.value]
+        _rate, _spot, _div = tuple(self._load_market(mkt_dict_, _load_param))
+        _sign = 1 if self._type == InstType.CallOption.value else -1
+        _vol, _status = BlackScholes.implied_vol(_sign, self.price if price_ is None else price_, _spot, self._strike,
+                                                 rate=_rate, div=_div, t=self._maturity)
+        if _status[0] != ImpliedVolStatus.Solved.value:
+            raise ValueError("no implied volatility for {}: {}".format(self, implied_vol_error[_status[0]]))
+        return _vol[0] * 100
+
+    def mc_path_value(self, mkt_dict_, engine_, rand_, value_type_='pv', unit_=None):
+        """
+        discounted Monte-Carlo value of each path simulated from draws rand_, in shape of (spots, paths)
+        value_type_ is 'pv', 'delta' (pathwise) or 'gamma' (pathwise / likelihood-ratio), as used in risk
+        """
+        if self._maturity == 0:
+            return super(Option, self).mc_path_value(mkt_dict_, engine_, rand_, value_type_, unit_)
+        _rate, _spot, _vol, _div, _method, _param, _sign, _strike, _t = self._prepare_risk_data(mkt_dict_, engine_)
+        _unit = unit_ or self.unit
+        _growth = MonteCarlo.stock_price(rand_.size, isp=1, rate=_rate, div=_div, vol=_vol, t=_t, rand=rand_)
+        _spot = array(_spot, dtype=float)[..., None]
+        _payoff = maximum(_sign * (_spot * _growth - _strike), 0)
+
+        if value_type_ == 'pv':
+            _value = _payoff
+        elif value_type_ == 'delta':
+            _value = _sign * (_payoff > 0) * _growth
+        elif value_type_ == 'gamma':
+            with errstate(divide='ignore', invalid='ignore'):
+                _value = where(_spot > 0, _sign * (_payoff > 0) * _growth * (rand_ / _vol / sqrt(_t) - 1) / _spot, 0)
+        else:
+            raise ValueError("invalid value type given: {}".format(value_type_))
+        return _value * exp(-_rate * _t) * _unit
 
     @property
     def type(self):
         """option type - CALL or PUT"""
-        if self._type is None:
-            raise ValueError("{} type not specified".format(self._name))
         return self._type
 
     @type.setter
@@ -105,8 +229,6 @@ class Option(Instrument):
     @property
     def strike(self):
         """strike level - percentage of ISP"""
-        if self._strike is None:
-            raise ValueError("strike level not specified")
         return self._strike
 
     @strike.setter
@@ -118,18 +240,28 @@ class Option(Instrument):
     @property
     def maturity(self):
         """option maturity - year"""
-        if self._maturity is None:
-            raise ValueError("maturity not specified")
         return self._maturity
 
     @maturity.setter
     def maturity(self, maturity_):
-        if maturity_ is not None:
-            if not isinstance(maturity_, (int, float)):
-                raise ValueError("type <int> or <float> is required for maturity, not {}".format(type(maturity_)))
-            if maturity_ < 0:
-                raise ValueError("non-negative value is required for maturity, not {}".format(maturity_))
-            self._maturity = maturity_
+        if maturity_ is None:
+            raise ValueError("maturity not specified")
+        if not isinstance(maturity_, (int, float)):
+            raise ValueError("type <int> or <float> is required for maturity, not {}".format(type(maturity_)))
+        if maturity_ < 0:
+            raise ValueError("non-negative value is required for maturity, not {}".format(maturity_))
+        self._maturity = maturity_
+
+    @property
+    def american(self):
+        """early exercise - exercisable at any time up to maturity if True, only at maturity otherwise"""
+        return self._american
+
+    @american.setter
+    def american(self, american_):
+        if not isinstance(american_, bool):
+            raise ValueError("type <bool> is required for american, not {}".format(type(american_)))
+        self._american = american_
 
     @staticmethod
     def _load_engine(engine_):
@@ -148,13 +280,119 @@ class Option(Instrument):
 
         return iter_num
 
+    @staticmethod
+    def _check_seed(seed_):
+        if seed_ is not None and (not isinstance(seed_, int) or seed_ < 0):
+            raise ValueError("non-negative <int> is required for seed, not {}".format(seed_))
+        return seed_
+
+    @staticmethod
+    def _check_workers(workers_):
+        if workers_ is None:
+            return 1
+        if not isinstance(workers_, int) or workers_ < 1:
+            raise ValueError("positive <int> is required for workers, not {}".format(workers_))
+        return workers_
+
+    @staticmethod
+    def _tree_param(param_):
+        """number of steps and whether tree is trinomial, according to engine parameters"""
+        _type = param_.get(EngineParam.TreeType.value, TreeType.Binomial.value)
+        if _type not in [_t.value for _t in TreeType]:
+            raise ValueError("invalid tree type given: {}".format(_type))
+        _steps = param_.get(EngineParam.TreeSteps.value)
+        _min_steps = trinomial_min_steps if _type == TreeType.Trinomial.value else binomial_min_steps
+        if not isinstance(_steps, int) or _steps < _min_steps:
+            raise ValueError("<int> of at least {} is required for {} tree steps, not {}".format(
+                _min_steps, _type.lower(), _steps))
+        return _steps, _type == TreeType.Trinomial.value
+
+    @staticmethod
+    def _pde_param(param_):
+        """
+        number of spot and time steps of finite difference grid according to engine parameters
+        spot steps are a minimum, wide grids get more (see FiniteDifference.spot_steps)
+        """
+        _steps = [param_.get(_param.value) for _param in [EngineParam.PDESpotSteps, EngineParam.PDETimeSteps]]
+        for _s in _steps:
+            if not isinstance(_s, int) or _s < 1:
+                raise ValueError("positive <int> is required for PDE steps, not {}".format(_s))
+        return tuple(_steps)
+
+    @classmethod
+    def _mc_normal(cls, param_):
+        """generate standard normal draws according to engine parameters"""
+        _iteration = cls._check_iter(param_.get(EngineParam.MCIteration.value))
+        _antithetic = cls._mc_var_reduction(param_) == VarReduction.Antithetic.value
+        _seed = cls._check_seed(param_.get(EngineParam.MCSeed.value))
+        _workers = cls._check_workers(param_.get(EngineParam.MCWorkers.value))
+        return MonteCarlo.normal(_iteration, antithetic_=_antithetic, seed_=_seed, workers_=_workers)
+
+    @classmethod
+    def _mc_normal_batches(cls, param_, batch_):
+        """generate standard normal draws batch by batch according to engine parameters"""
+        _iteration = cls._check_iter(param_.get(EngineParam.MCIteration.value))
+        _antithetic = cls._mc_var_reduction(param_) == VarReduction.Antithetic.value
+        _seed = cls._check_seed(param_.get(EngineParam.MCSeed.value))
+        return MonteCarlo.normal_batches(_iteration, batch_, antithetic_=_antithetic, seed_=_seed)
+
+    @staticmethod
+    def _mc_var_reduction(param_):
+        _method = param_.get(EngineParam.MCVarReduction.value, VarReduction.Plain.value)
+        if _method not in [_v.value for _v in VarReduction]:
+            raise ValueError("invalid variance reduction method given: {}".format(_method))
+        return _method
+
+    def _mc_rand(self, engine_, param_):
+        """standard normal draws attached to the engine (common random numbers), or new draws if not available"""
+        _rand = engine_.get('rand')
+        return self._mc_normal(param_) if _rand is None else _rand
+
+    def _mc_growth(self, engine_, param_, rate_, div_, vol_, t_):
+        """simulate terminal prices for a unit initial spot"""
+        _rand = self._mc_rand(engine_, param_)
+        return MonteCarlo.stock_price(_rand.size, isp=1, rate=rate_, div=div_, vol=vol_, t=t_, rand=_rand)
+
+    @staticmethod
+    def _mc_map(kernel_, spot_, growth_):
+        """evaluate Monte-Carlo kernel on terminal prices rescaled to each given spot"""
+        if ndim(spot_):
+            return array([kernel_(_spot * growth_) for _spot in spot_])
+        return kernel_(spot_ * growth_)
+
+    def _as_book(self, unit_):
+        """option as a one-leg book"""
+        from instrument.book import Book
+        return Book([1 if self._type == InstType.CallOption.value else -1], [self._strike], [self._maturity],
+                    [unit_], [0], [self._american])
+
+    def _greek(self, greek_, mkt_dict_, engine_, unit_):
+        """
+        greek of given name, closed-form under Black-Scholes
+        Monte-Carlo, tree and PDE greeks are evaluated as a one-leg book (see Book.greeks)
+        """
+        _rate, _spot, _vol, _div, _method, _param, _sign, _strike, _t = self._prepare_risk_data(mkt_dict_, engine_)
+        _unit = unit_ or self.unit
+
+        if _method == EngineMethod.BS.value:
+            return BlackScholes.greeks(_sign, _spot, _strike, [greek_], rate=_rate, div=_div, vol=_vol, t=_t)[0] * \
+                greek_scale.get(greek_, 1) * _unit
+
+        elif _method in book_engine:
+            return getattr(self._as_book(_unit), greek_)(mkt_dict_, engine_)[..., 0]
+
     def _prepare_risk_data(self, mkt_dict_, engine_):
         _load_param = [EnvParam.RiskFreeRate.value, EnvParam.UdSpotForPrice.value, EnvParam.UdVolatility.value,
                        EnvParam.UdDivYieldRatio.value]
         _rate, _spot, _vol, _div = tuple(self._load_market(mkt_dict_, _load_param))
         _method, _param = self._load_engine(engine_)
-        _sign = 1 if self.type == InstType.CallOption.value else -1
-        return _rate, _spot, _vol, _div, _method, _param, _sign, self.strike, self.maturity
+        # expired options are worth their intrinsic value, which Black-Scholes gives exactly for zero maturity
+        if self._maturity == 0:
+            _method = EngineMethod.BS.value
+        elif self._american and _method not in american_engine:
+            raise ValueError(american_error)
+        _sign = 1 if self._type == InstType.CallOption.value else -1
+        return _rate, _spot, _vol, _div, _method, _param, _sign, self._strike, self._maturity
 
 
 if __name__ == '__main__':
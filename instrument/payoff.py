@@ -0,0 +1,88 @@
+# coding=utf-8
+"""exact payoff at expiry of a portfolio as a piecewise linear function of spot"""
+
+from instrument.book import type_sign
+from numpy import append as np_append, array, bincount, concatenate, cumsum, diff, errstate, inf, isinf, maximum, \
+    searchsorted, unique, where
+
+
+class PayoffProfile(object):
+    """
+    payoff at expiry held as knots, values at knots and slopes of segments starting at knots
+    first knot is spot 0, the last segment extends to infinity
+    every option adds its unit to the slope at its strike (call from 0 to unit, put from -unit to 0),
+    so a book is aggregated by sorting its strikes once
+    """
+    def __init__(self, knot_, value_, slope_):
+        self.knot = array(knot_, dtype=float)
+        self.value = array(value_, dtype=float)
+        self.slope = array(slope_, dtype=float)
+        if not (self.knot.shape == self.value.shape == self.slope.shape) or not self.knot.size:
+            raise ValueError("knots, values and slopes should be non-empty and have same length")
+
+    @classmethod
+    def from_arrays(cls, sign_, strike_, unit_, cost_=None):
+        """
+        build profile from columns of legs, sign_ is 1 for call, -1 for put and 0 for stock
+        net payoff is given by cost_, i.e. total cost is subtracted
+        """
+        _sign, _strike, _unit = array(sign_, dtype=int), array(strike_, dtype=float), array(unit_, dtype=float)
+        _call, _put = _sign == 1, _sign == -1
+        # payoff and right-hand slope at spot 0, options with strike above 0 add their unit to the slope at strike
+        _value_0 = (_unit * maximum(-_strike, 0))[_call].sum() + (_unit * maximum(_strike, 0))[_put].sum()
+        if cost_ is not None:
+            _value_0 -= (array(cost_, dtype=float) * _unit).sum()
+        _slope_0 = _unit[_sign == 0].sum() + _unit[_call & (_strike <= 0)].sum() - _unit[_put & (_strike > 0)].sum()
+
+        _kink = (_sign != 0) & (_strike > 0)
+        _knot, _inverse = unique(_strike[_kink], return_inverse=True)
+        _jump = bincount(_inverse, weights=_unit[_kink], minlength=_knot.size)
+        _knot, _jump = concatenate([[0.], _knot[_jump != 0]]), concatenate([[0.], _jump[_jump != 0]])
+        _slope = _slope_0 + cumsum(_jump)
+        _value = _value_0 + concatenate([[0.], cumsum(_slope[:-1] * diff(_knot))])
+        return cls(_knot, _value, _slope)
+
+    @classmethod
+    def from_components(cls, inst_list_, net_=False):
+        """build profile from instruments, net_ for net payoff (payoff minus cost)"""
+        _sign = [type_sign[_inst.type] for _inst in inst_list_]
+        _strike = [_inst.strike if _s else 0 for _inst, _s in zip(inst_list_, _sign)]
+        _unit = [_inst.unit for _inst in inst_list_]
+        _cost = [_inst.price for _inst in inst_list_] if net_ else None
+        return cls.from_arrays(_sign, _strike, _unit, _cost)
+
+    @classmethod
+    def from_book(cls, book_, net_=False):
+        """build profile from a columnar book, net_ for net payoff (payoff minus cost)"""
+        return cls.from_arrays(book_.sign, book_.strike, book_.unit, book_.cost if net_ else None)
+
+    def __call__(self, spot_):
+        """exact payoff at given spots (scalar or numpy array)"""
+        _idx = searchsorted(self.knot, spot_, side='right') - 1
+        _idx = where(_idx < 0, 0, _idx)
+        return (self.value[_idx] + self.slope[_idx] * (spot_ - self.knot[_idx]))[()]
+
+    def max_value(self):
+        """maximum payoff over non-negative spots, inf if unbounded"""
+        return inf if self.slope[-1] > 0 else self.value.max()
+
+    def min_value(self):
+        """minimum payoff over non-negative spots, -inf if unbounded"""
+        return -inf if self.slope[-1] < 0 else self.value.min()
+
+    def roots(self):
+        """
+        spots where payoff is zero (break-even points for net payoff), sorted
+        both ends of a segment are given if payoff is zero all over the segment, inf for an unbounded end
+        """
+        _end = np_append(self.knot[1:], inf)
+        with errstate(divide='ignore', invalid='ignore'):
+            _root = self.knot - self.value / self.slope
+        _cross = (self.slope != 0) & (_root >= self.knot) & (_root < _end)
+        _flat = (self.slope == 0) & (self.value == 0)
+        _root = concatenate([_root[_cross], self.knot[_flat], _end[_flat]])
+        return unique(_root[~isinf(_root) | (_root > 0)])
+
+    def kinks(self, lower_=0, upper_=inf):
+        """knots within given range, a linear interpolation through them and the range ends is exact"""
+        return self.knot[(self.knot >= lower_) & (self.knot <= upper_)]
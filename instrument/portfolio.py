@@ -1,12 +1,22 @@
 # coding=utf-8
 """definition of portfolio for payoff estimation"""
 
-from copy import deepcopy
+from collections import Counter
 from enum import Enum
 from instrument import InstType, option_type
+from instrument.cache import cached_curve, engine_key
 from instrument.default_param import env_default_param
-from instrument.env_param import EnvParam
-from numpy import arange, transpose
+from instrument.env_param import EngineMethod, EngineParam, EnvParam, VarReduction
+from instrument.market import Market
+from instrument.book import Book
+from instrument.option import Option
+from instrument.payoff import PayoffProfile
+from instrument.stock import Stock
+from numpy import arange, argsort, array, array_equal, array_split, broadcast_to, ceil, clip, concatenate, cumsum, \
+    diag, einsum, exp, flatnonzero, floor, linspace, log2, maximum, moveaxis, ones, outer, repeat, searchsorted, sort, \
+    sqrt, unique, where, zeros
+from utils import PRECISION_ZERO
+from utils.monte_carlo import MonteCarlo
 
 
 class CurveType(Enum):
@@ -17,6 +27,51 @@ class CurveType(Enum):
     PV = 'PV'
     Delta = 'Delta'
     Gamma = 'Gamma'
+    Vega = 'Vega'
+    Theta = 'Theta'
+    Rho = 'Rho'
+    Vanna = 'Vanna'
+    Volga = 'Volga'
+
+
+class SurfaceAxis(Enum):
+    """second axis of portfolio surface, against spot"""
+    Volatility = 'Volatility'
+    Time = 'Time'
+
+
+class CurveCancelled(Exception):
+    """curve request cancelled through its progress callback"""
+
+
+chunk_size = 64
+
+mc_batch_size = 2 ** 13
+
+# adaptive spot grid: curves are refined from a coarse grid through strikes until linear interpolation
+# between grid points is within tolerance (relative to curve range) or after the maximum number of bisections
+adaptive_tol = 1e-3
+adaptive_seed = 16
+adaptive_depth = 6
+# numerical noise of tree engine would be bisected down to full depth, so its grid holds at most as many spots as
+# the uniform grid of this step, Monte-Carlo and PDE engines price any number of spots for about the cost of one
+# (one set of prefix sums, or the same solves, per maturity bucket), so their curves are evaluated once on that
+# uniform grid with strikes added
+adaptive_limit_step = 1
+
+expiry_curve = [CurveType.Payoff.value, CurveType.NetPayoff.value]
+
+# component pricing methods evaluated through Book
+book_func = ['pnl', 'pv', 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna', 'volga']
+
+risk_curve = [CurveType.PnL.value, CurveType.PV.value, CurveType.Delta.value, CurveType.Gamma.value]
+
+greek_curve = [CurveType.Vega.value, CurveType.Theta.value, CurveType.Rho.value, CurveType.Vanna.value,
+               CurveType.Volga.value]
+
+# default surface grid: volatility scaled around market volatility, or time elapsed up to longest maturity
+surface_size = 21
+surface_vol_scale = (0.5, 1.5)
 
 
 class Portfolio(object):
@@ -25,13 +80,15 @@ class Portfolio(object):
     can estimate all components total payoff
     """
     def __init__(self, inst_list_):
-        self._components = inst_list_
+        self._components = []
         self._components_show = []
         self._mkt_data = None
         self._engine = None
+        self._leg_curve = dict()
         self._center = env_default_param[EnvParam.UdSpotForPrice.value]
-        self._maturity = self._check_maturity()
-        self._has_stock = self._check_stock()
+        self._maturity = 0
+        self._has_stock = False
+        self.set_components(inst_list_)
         self._func_map = {
             CurveType.Payoff.value: ('payoff', False),
             CurveType.NetPayoff.value: ('net_payoff', False),
@@ -39,40 +96,306 @@ class Portfolio(object):
             CurveType.PV.value: ('pv', True),
             CurveType.Delta.value: ('delta', True),
             CurveType.Gamma.value: ('gamma', True),
+            CurveType.Vega.value: ('vega', True),
+            CurveType.Theta.value: ('theta', True),
+            CurveType.Rho.value: ('rho', True),
+            CurveType.Vanna.value: ('vanna', True),
+            CurveType.Volga.value: ('volga', True),
         }
 
-    def gen_curve(self, type_, margin_=20, step_=1, full_=False):
-        """generate x (spot / ISP) and y (payoff or) for portfolio payoff curve"""
-        _curve_func = [self._comp_sum(type_)]
-        _engine = self._func_map[type_][1]
-        if full_:
-            for _comp in self._components_show:
-                _curve_func.append(_comp.__getattribute__(self._func_map[type_][0]))
+    @cached_curve
+    def gen_curve(self, type_, margin_=20, step_=1, full_=False, progress_=None):
+        """
+        generate x (spot / ISP) and y (payoff or) for portfolio payoff curve
+        component curves are kept by component terms: after components are added, copied, deleted or edited,
+        only changed components are evaluated and the total curve is updated by their contribution
+        progress_(done, total) is called after each chunk of spot grid is evaluated for a component,
+        the request is cancelled by raising CurveCancelled if it returns False
+        step_ None gives an adaptive grid, dense around strikes and where the curve bends (see _x_adaptive)
+        Payoff and Net Payoff are exact piecewise linear curves, the adaptive grid holds just their kinks
+        PnL is PV less cost, so component curves are kept by pricing terms and a cost change reprices nothing
+        """
+        if type_ in expiry_curve:
+            return self._gen_payoff_curve(type_, margin_, step_, full_)
+        if type_ == CurveType.PnL.value:
+            _x, _y = self.gen_curve(CurveType.PV.value, margin_, step_, full_, progress_)
+            return _x, _y - self._cost(full_)[:, None]
+
+        if step_ is None:
+            _x, _value = self._x_adaptive([type_], margin_, full_, progress_)
+            _value = _value[type_]
+        else:
+            _x, _value = self._x_range(margin_, step_), dict()
+        _state = self._curve_state(type_, _x)
+        _count = Counter([_comp.terms() for _comp in self._components])
+        _show = [_comp.terms() for _comp in self._components_show] if full_ else []
+
+        _new = dict()
+        for _comp in self._components + (self._components_show if full_ else []):
+            if _comp.terms() in _value:
+                _state['leg'].setdefault(_comp.terms(), _value[_comp.terms()])
+            elif _comp.terms() not in _state['leg']:
+                _new.setdefault(_comp.terms(), _comp)
+        if _new:
+            _state['leg'].update(zip(_new.keys(), self._eval_legs(type_, _x, list(_new.values()), progress_)))
+
+        for _terms, _num in (_count - _state['count']).items():
+            _state['total'] += _num * _state['leg'][_terms]
+        for _terms, _num in (_state['count'] - _count).items():
+            _state['total'] -= _num * _state['leg'][_terms]
+        _state['count'] = _count
+        for _terms in set(_state['leg']) - set(_count) - set(_show):
+            del _state['leg'][_terms]
+
+        return _x, array([_state['total']] + [_state['leg'][_terms] for _terms in _show])
+
+    def gen_surface(self, type_, axis_, values_=None, margin_=20, step_=1):
+        """
+        generate x (spot), z (volatility in percent or elapsed time in years) and y in shape of (z, x)
+        for portfolio surface of PnL, PV or any greek
+        elapsed time shortens maturity of every option, options expire once it reaches their maturity
+        all grid points are evaluated together as a book, see Book.surface
+        """
+        if type_ not in risk_curve + greek_curve:
+            raise ValueError("surface is not supported for {} curve".format(type_))
+        if axis_ == SurfaceAxis.Volatility.value:
+            _vol = self.mkt_data.get(EnvParam.UdVolatility.value) * 100
+            _z = array(values_ if values_ is not None else linspace(*surface_vol_scale, surface_size) * _vol,
+                       dtype=float)
+            if (_z <= 0).any():
+                raise ValueError("positive value is required for volatility")
+            _kwargs = dict(vol_=_z / 100)
+        elif axis_ == SurfaceAxis.Time.value:
+            _z = array(values_ if values_ is not None else linspace(0, self._maturity, surface_size), dtype=float)
+            if (_z < 0).any():
+                raise ValueError("non-negative value is required for elapsed time")
+            _kwargs = dict(elapsed_=_z)
+        else:
+            raise ValueError("invalid surface axis given: {}".format(axis_))
 
         _x = self._x_range(margin_, step_)
-        _y = []
-        for _spot in _x:
-            _mkt = deepcopy(self.mkt_data)
-            _mkt[EnvParam.UdSpotForPrice.value] = _spot
-            _input = (_mkt, self.engine) if _engine else (_mkt, )
-            _y.append([_func(*_input) for _func in _curve_func])
-        _y = transpose(_y)
+        _book = Book.from_components(self._components)
+        _y = _book.surface(self.mkt_data.with_spot(_x), self._curve_engine(), self._func_map[type_][0], **_kwargs)
+        return _x, _z, _y
+
+    def implied_vol(self):
+        """
+        Black-Scholes implied volatility in percent of each component quoted at its price, solved together
+        :return: volatility (nan if not solved) and ImpliedVolStatus value of each component
+        """
+        return Book.from_components(self._components).implied_vol(self.mkt_data)
+
+    def stress(self, scenario_):
+        """
+        stress PnL of each component under each scenario of a ScenarioSet, in shape of (scenarios, components)
+        i.e. component value on shocked market less its value on current market, see Book.stress
+        portfolio stress PnL is the sum over components
+        """
+        return Book.from_components(self._components).stress(self.mkt_data, self._curve_engine(), scenario_)
+
+    def payoff_profile(self, net_=False, inst_list_=None):
+        """exact payoff at expiry of portfolio (or given components), net_ for net payoff"""
+        return PayoffProfile.from_components(self._components if inst_list_ is None else inst_list_, net_)
+
+    def is_progressive(self, type_):
+        """
+        check whether curve of given type is refined progressively by iter_curve
+        greeks beyond Delta and Gamma are bumped revaluations, not path averages, so they are not
+        """
+        return type_ in risk_curve and self.engine.get('engine') == EngineMethod.MC.value
+
+    def iter_curve(self, type_, margin_=20, step_=1, full_=False, batch_=None, progress_=None):
+        """
+        generate Monte-Carlo curve progressively
+        yields x, y and standard error of y after each batch of paths, estimates refine as paths accumulate
+        Delta and Gamma use the pathwise and pathwise / likelihood-ratio estimators as in risk
+        batches together hold the draws of gen_curve, and control variate is applied to PV from sums accumulated
+        over batches, so the last estimate is the gen_curve one for the same seed
+        component curves and errors are kept by component terms, only new components are simulated,
+        error of kept part is that of the last finished total curve plus errors of components changed since
+        curves not evaluated by Monte-Carlo are yielded once with zero standard error
+        progress_(done, total) is called after each batch, the request is cancelled if it returns False
+        """
+        if not self.is_progressive(type_):
+            _x, _y = self.gen_curve(type_, margin_, step_, full_, progress_)
+            yield _x, _y, zeros(_y.shape)
+            return
+
+        _func_name = self._func_map[type_][0]
+        _x = self._x_range(margin_, step_)
+        _param = self.engine.get('param', {})
+        _method = Option._mc_var_reduction(_param)
+        _value_type = 'pv' if type_ in [CurveType.PV.value, CurveType.PnL.value] else _func_name
+        _shift = self._cost(full_)[:, None] if type_ == CurveType.PnL.value else 0
+        _total = Option._check_iter(_param.get(EngineParam.MCIteration.value))
+
+        # kept component curves are shared with gen_curve of the same curve type, together with their errors
+        _state = self._curve_state(CurveType.PV.value if type_ == CurveType.PnL.value else type_, _x)
+        _err = _state.setdefault('err', dict())
+        _legs = dict()
+        for _comp in self._components + (self._components_show if full_ else []):
+            _legs.setdefault(_comp.terms(), _comp)
+        _count = Counter([_comp.terms() for _comp in self._components])
+        _show = [_comp.terms() for _comp in self._components_show] if full_ else []
+        _new = [_terms for _terms in _legs if _terms not in _state['leg'] or _terms not in _err]
+        _kept = [_terms for _terms in _count if _terms not in _new]
+        _kept_y = sum([_num * _state['leg'][_terms] for _terms, _num in _count.items() if _terms in _kept],
+                      zeros(_x.shape))
+        # error of kept part is bounded by error of the last finished total curve plus errors of changed components
+        _base_count, _base_err = _state.get('base', (Counter(), zeros(_x.shape)))
+        if any([_terms in _new or _terms not in _err for _terms in _base_count]):
+            _base_count, _base_err = Counter(), zeros(_x.shape)
+        _kept_err = sum([abs(_count[_terms] * (_terms in _kept) - _base_count[_terms]) * _err[_terms]
+                         for _terms in set(_kept) | set(_base_count)], _base_err)
+        _coef = array([_count[_terms] for _terms in _new], dtype=float)
+
+        # control of an option is its terminal price for unit spot, shared by options of the same maturity
+        _maturity = sorted(set([_legs[_terms].maturity for _terms in _new if _legs[_terms].type in option_type]
+                               if _method == VarReduction.ControlVariate.value and _value_type == 'pv' else []))
+        _maturity = [_t for _t in _maturity if _t > 0]
+        _group = array([_maturity.index(_legs[_terms].maturity) if _legs[_terms].type in option_type and
+                        _legs[_terms].maturity in _maturity else -1 for _terms in _new], dtype=int)
+        _rate, _div, _vol = [self.mkt_data.get(_p) for _p in [EnvParam.RiskFreeRate.value,
+                                                              EnvParam.UdDivYieldRatio.value,
+                                                              EnvParam.UdVolatility.value]]
+        _forward = exp((_rate - _div) * array(_maturity, dtype=float))
+
+        # sums over paths of component values, of their units (antithetic pair averages) and squared units,
+        # and of values times controls, the same for the new part of total curve
+        _sv, _su, _suu, _svg = [zeros((len(_new), _x.size)) for _ in range(4)]
+        _sy, _syy, _syg = zeros(_x.size), zeros(_x.size), zeros((len(_maturity), _x.size))
+        _sg, _sgg = zeros(len(_maturity)), zeros((len(_maturity), len(_maturity)))
+        _paths, _units = 0, 0
+
+        def _estimate():
+            """component curves and errors, and new part of total curve with its standard error"""
+            _mean = _sv / _paths
+            _var = _suu / _units - (_su / _units) ** 2
+            _y_var = _syy / _units - (_sy / _units) ** 2
+            if _maturity:
+                _g_mean = _sg / _paths
+                _g_cov = _sgg / _paths - outer(_g_mean, _g_mean)
+                _on = (_group >= 0)[:, None]
+                _cov = where(_on, _svg / _paths - _mean * _g_mean[_group][:, None], 0)
+                _beta = where(_on, _cov / where(_on, diag(_g_cov)[_group][:, None], 1), 0)
+                _mean = _mean - _beta * where(_on, (_g_mean - _forward)[_group][:, None], 0)
+                _var = _var - _beta * _cov
+                # total curve residual is its new part less the controls weighted by component betas
+                _b = array([_coef[_group == _g] @ _beta[_group == _g] for _g in range(len(_maturity))])
+                _y_cov = _syg / _paths - _sy / _paths * _g_mean[:, None]
+                _y_var = _y_var - 2 * (_b * _y_cov).sum(axis=0) + einsum('gx,hx,gh->x', _b, _b, _g_cov)
+            return dict(zip(_new, zip(_mean, sqrt(maximum(_var, 0) / _units)))), _coef @ _mean, \
+                sqrt(maximum(_y_var, 0) / _units)
+
+        def _curve(_leg, _y_new, _y_err):
+            _row = [_leg[_terms] if _terms in _leg else (_state['leg'][_terms], _err[_terms]) for _terms in _show]
+            return _x, array([_kept_y + _y_new] + [_r[0] for _r in _row]) - _shift, \
+                array([_kept_err + _y_err] + [_r[1] for _r in _row])
+
+        if not _new:
+            yield _curve(dict(), 0, 0)
+            return
+
+        for _rand in Option._mc_normal_batches(_param, batch_ or mc_batch_size):
+            _pair = _rand.size // 2 if _method == VarReduction.Antithetic.value else 0
+            _growth = array([MonteCarlo.stock_price(_rand.size, isp=1, rate=_rate, div=_div, vol=_vol, t=_t,
+                                                    rand=_rand) for _t in _maturity]).reshape(-1, _rand.size)
+            _sg += _growth.sum(axis=1)
+            _sgg += _growth @ _growth.T
+            for _slice in [slice(_i, _i + chunk_size) for _i in range(0, _x.size, chunk_size)]:
+                _mkt = self.mkt_data.with_spot(_x[_slice])
+                _y = zeros((_x[_slice].size, _rand.size))
+                for _idx, _terms in enumerate(_new):
+                    _value = _legs[_terms].mc_path_value(_mkt, self.engine, _rand, _value_type) + zeros(_y.shape)
+                    _unit = _path_unit(_value, _pair)
+                    _sv[_idx, _slice] += _value.sum(axis=1)
+                    _su[_idx, _slice] += _unit.sum(axis=1)
+                    _suu[_idx, _slice] += (_unit ** 2).sum(axis=1)
+                    if _group[_idx] >= 0:
+                        _svg[_idx, _slice] += _value @ _growth[_group[_idx]]
+                    if _coef[_idx]:
+                        _y += _coef[_idx] * _value
+                _unit = _path_unit(_y, _pair)
+                _sy[_slice] += _unit.sum(axis=1)
+                _syy[_slice] += (_unit ** 2).sum(axis=1)
+                _syg[:, _slice] += _growth @ _y.T
+            _paths += _rand.size
+            _units += _rand.size - _pair
+
+            yield _curve(*_estimate())
+            self._report(None, _paths - 1, _total, progress_)
+
+        _leg, _y_new, _y_err = _estimate()
+        for _terms, (_mean, _leg_err) in _leg.items():
+            _state['leg'].setdefault(_terms, _mean)
+            _err[_terms] = _leg_err
+        _state['base'] = (_count, _kept_err + _y_err)
+        for _terms in set(_state['leg']) - set(_state['count']) - set(_legs):
+            del _state['leg'][_terms]
+        for _terms in set(_err) - set(_state['leg']):
+            del _err[_terms]
+
+    def gen_curves(self, types_, margin_=20, step_=1, full_=False):
+        """
+        generate curves of several types on the same spot grid, returns x and a dict of y by curve type
+        PV, PnL and greeks are taken from a single evaluation of all components, sharing d1 / d2 terms and
+        Monte-Carlo revaluations
+        step_ None gives an adaptive grid refined for all given curve types
+        """
+        if step_ is None:
+            _eval_type = [CurveType.PV.value if _type == CurveType.PnL.value else _type for _type in types_]
+            _x, _value = self._x_adaptive(list(dict.fromkeys(_eval_type)), margin_, full_)
+            _count = Counter([_comp.terms() for _comp in self._components])
+            _shift = {_type: self._cost(full_)[:, None] if _type == CurveType.PnL.value else 0 for _type in types_}
+            return _x, {_type: array([sum([_num * _value[_eval][_terms] for _terms, _num in _count.items()],
+                                          zeros(_x.shape))] +
+                                     [_value[_eval][_comp.terms()] for _comp in self._components_show if full_])
+                        - _shift[_type] for _type, _eval in zip(types_, _eval_type)}
+
+        _x = self._x_range(margin_, step_)
+        _book_type = [_type for _type in types_ if _type in risk_curve + greek_curve]
+        if len(_book_type) < 2:
+            return _x, {_type: self.gen_curve(_type, margin_, step_, full_)[1] for _type in types_}
+
+        _group = [self._components] + ([[_comp] for _comp in self._components_show] if full_ else [])
+        _comps = list(set(self._components + (self._components_show if full_ else [])))
+        _func = set([self._func_map[_type][0] for _type in _book_type])
+        _value = _eval_book(_comps, set(['pv' if _f == 'pnl' else _f for _f in _func]), self.mkt_data.with_spot(_x),
+                            self._curve_engine())
+        if 'pnl' in _func:
+            _value['pnl'] = _value['pv'] - array([[_comp.price * _comp.unit] for _comp in _comps])
+        _idx = {_comp: _i for _i, _comp in enumerate(_comps)}
+
+        _y = dict()
+        for _type in types_:
+            if _type in _book_type:
+                _rows = _value[self._func_map[_type][0]]
+                _y[_type] = array([broadcast_to(sum([_rows[_idx[_comp]] for _comp in _row]), _x.shape)
+                                   for _row in _group], dtype=float)
+            else:
+                _y[_type] = self.gen_curve(_type, margin_, step_, full_)[1]
         return _x, _y
 
+    def set_components(self, inst_list_):
+        """set portfolio components, kept component curves are reused by following curve requests"""
+        self._components = list(inst_list_)
+        self._maturity = self._check_maturity()
+        self._has_stock = self._check_stock()
+
     def set_show(self, inst_show_):
         """set components that be plotted with portfolio"""
-        self._components_show = list(set(inst_show_) - set(self._components))
+        self._components_show = list(inst_show_)
 
     def set_mkt(self, mkt_data_):
-        """set market data"""
-        self.mkt_data = mkt_data_
+        """set market data, parsed once into a market snapshot"""
+        self.mkt_data = Market.from_dict(mkt_data_)
 
     def set_engine(self, engine_):
         """set pricing engine"""
         self.engine = engine_
 
     def maturity(self):
-        """return common maturity of portfolio"""
+        """return longest maturity of portfolio components"""
         return self._maturity
 
     def center(self):
@@ -105,24 +428,284 @@ class Portfolio(object):
     def engine(self, engine_):
         self._engine = engine_
 
-    def _comp_sum(self, value_type_):
-        def _sum_func(*args):
-            return sum([_comp.__getattribute__(self._func_map[value_type_][0])(*args) for _comp in self._components])
-        return _sum_func
+    def _gen_payoff_curve(self, type_, margin_, step_, full_):
+        _net = type_ == CurveType.NetPayoff.value
+        _profile = [self.payoff_profile(_net)] + \
+            ([self.payoff_profile(_net, [_comp]) for _comp in self._components_show] if full_ else [])
+        if step_ is None:
+            _lower, _upper = self._x_bound(margin_)
+            _x = unique(concatenate([[_lower, _upper, clip(self._center, _lower, _upper)]] +
+                                    [_p.kinks(_lower, _upper) for _p in _profile]))
+        else:
+            _x = self._x_range(margin_, step_)
+        return _x, array([_p(_x) for _p in _profile], dtype=float).reshape(len(_profile), _x.size)
 
-    def _x_range(self, margin_, step_):
+    def _eval_legs(self, type_, x_, legs_, progress_=None, engine_=None):
+        """
+        evaluate curves of given components on spot array x_, one row for each component
+        engine_ could be given to reuse the Monte-Carlo draws of a previous evaluation
+        """
+        _func_name, _use_engine = self._func_map[type_]
+        _engine = (engine_ or self._curve_engine()) if _use_engine else None
+        _workers = Option._check_workers(_engine.get('param', {}).get(EngineParam.MCWorkers.value)) \
+            if _engine and _engine.get('engine') == EngineMethod.MC.value else 1
+        # PDE engine prices every spot of the grid by the same solves, so the grid is not split
+        _chunks = [x_] if _engine and _engine.get('engine') == EngineMethod.PDE.value else \
+            array_split(x_, min(max(-(-x_.size // chunk_size), _workers), max(x_.size, 1)))
+
+        if _workers > 1 and x_.size > 1:
+            from utils.parallel import SharedArray, pool_imap
+            _engine = dict(_engine)
+            with SharedArray.from_array(_engine.pop('rand')) as _shared:
+                _jobs = [(legs_, _func_name, self.mkt_data.with_spot(_chunk), _engine, _shared.spec())
+                         for _chunk in _chunks]
+                _res = pool_imap(_eval_chunk, _jobs, _workers)
+                try:
+                    return concatenate([self._report(_y, _idx, len(_chunks), progress_)
+                                        for _idx, _y in enumerate(_res)], axis=1)
+                finally:
+                    _res.close()
+
+        if _func_name in book_func and _engine and _engine.get('engine') == EngineMethod.MC.value:
+            # components of one maturity go through all chunks together, so their terminal prices and prefix sums
+            # are computed once per market bump and kept only while they are priced
+            _group = dict()
+            for _idx, _leg in enumerate(legs_):
+                _group.setdefault(_leg.maturity if _leg.type in option_type else None, []).append(_idx)
+            _res, _done = zeros((len(legs_), x_.size)), 0
+            _start = concatenate([[0], cumsum([_chunk.size for _chunk in _chunks])]).astype(int)
+            for _idx in _group.values():
+                _engine_g = dict(_engine, sums=dict())
+                for _num, _chunk in enumerate(_chunks):
+                    _res[_idx, _start[_num]:_start[_num + 1]] = self._report(
+                        _eval_legs([legs_[_i] for _i in _idx], _func_name, self.mkt_data.with_spot(_chunk), _engine_g),
+                        _done, len(_group) * len(_chunks), progress_)
+                    _done += 1
+            return _res
+
+        if _func_name in book_func:
+            # components priced together by maturity bucket, progress is reported per chunk of spot grid
+            return concatenate([self._report(_eval_legs(legs_, _func_name, self.mkt_data.with_spot(_chunk), _engine),
+                                             _idx, len(_chunks), progress_)
+                                for _idx, _chunk in enumerate(_chunks)], axis=1)
+
+        _res = []
+        for _idx, _chunk in enumerate(_chunks):
+            _mkt = self.mkt_data.with_spot(_chunk)
+            _res.append(concatenate([self._report(_eval_legs([_leg], _func_name, _mkt, _engine),
+                                                  _idx * len(legs_) + _num, len(_chunks) * len(legs_), progress_)
+                                     for _num, _leg in enumerate(legs_)] or [zeros((0, _chunk.size))]))
+        return concatenate(_res, axis=1)
+
+    def _cost(self, full_=False):
+        """total cost of portfolio, and of each shown component with full_"""
+        return array([sum([_comp.price * _comp.unit for _comp in self._components])] +
+                     ([_comp.price * _comp.unit for _comp in self._components_show] if full_ else []), dtype=float)
+
+    @staticmethod
+    def _report(value_, done_, total_, progress_):
+        """report progress of a finished step, raise CurveCancelled if the request is cancelled"""
+        if progress_ is not None and progress_(done_ + 1, total_) is False:
+            raise CurveCancelled("curve request cancelled")
+        return value_
+
+    def _curve_state(self, type_, x_):
+        """
+        kept component curves and total curve of given curve type
+        they are reset when spot grid, market or engine changes, and not kept if curve is not reproducible
+        """
+        _state = self._kept_state(type_)
+        if _state is None or not array_equal(_state['x'], x_):
+            _state = dict(context=self._curve_context(type_), x=x_, leg=dict(), count=Counter(), total=zeros(x_.shape))
+            if _state['context'] is not None:
+                self._leg_curve[type_] = _state
+        return _state
+
+    def _kept_state(self, type_):
+        """kept curve state of given curve type on any spot grid, None if market or engine has changed"""
+        _context, _state = self._curve_context(type_), self._leg_curve.get(type_)
+        return _state if _context is not None and _state is not None and _state['context'] == _context else None
+
+    def _curve_context(self, type_):
+        """market and engine a curve of given type depends on, None if the curve is not reproducible"""
+        _engine_key = engine_key(self.engine) if self._func_map[type_][1] else ()
+        return (self.mkt_data.key(), _engine_key) if _engine_key is not None else None
+
+    def _curve_key(self, type_, margin_, step_, full_):
+        """cache key of a curve request, None if the curve is not reproducible"""
+        _engine_key = engine_key(self.engine) if self._func_map[type_][1] else ()
+        if _engine_key is None:
+            return None
+        # cost only enters PnL and Net Payoff
+        _cost = tuple(self._cost(full_)) if type_ in [CurveType.PnL.value, CurveType.NetPayoff.value] else ()
+        return ('curve', type_, margin_, step_, full_, _cost, tuple([_comp.terms() for _comp in self._components]),
+                tuple([_comp.terms() for _comp in self._components_show]) if full_ else (),
+                self.mkt_data.key(), _engine_key)
+
+    def _curve_engine(self):
+        """
+        attach one set of random draws to Monte-Carlo engine for a curve request
+        all spots and components reuse it, so curve errors are correlated and the curve is smooth
+        draws are sorted once here, as Book prices every maturity bucket on sorted draws
+        """
+        _engine = self.engine
+        if _engine.get('engine') == EngineMethod.MC.value and _engine.get('rand') is None:
+            _engine = dict(_engine, rand=sort(Option._mc_normal(_engine.get('param', {}))))
+        return _engine
+
+    def _x_bound(self, margin_):
         _strike_list = [_comp.strike for _comp in self._components if _comp.type in option_type]
         _min = min(_strike_list) if _strike_list else self._center
         _max = max(_strike_list) if _strike_list else self._center
         _dist = max([self._center - _min, _max - self._center])
-        _x = arange(max(self._center - _dist - margin_, 0), self._center + _dist + margin_ + step_, step_)
+        return max(self._center - _dist - margin_, 0), self._center + _dist + margin_
+
+    def _x_range(self, margin_, step_):
+        _lower, _upper = self._x_bound(margin_)
+        _x = arange(_lower, _upper + step_, step_)
         return _x
 
+    def _x_adaptive(self, types_, margin_, full_=False, progress_=None):
+        """
+        adaptive spot grid for curves of given types
+        starts from a coarse uniform grid (adaptive_seed to twice as many intervals) with bounds, strikes and center
+        added, so payoff kinks are grid points,
+        then bisects every interval whose midpoint differs from linear interpolation of the total curve by more
+        than adaptive_tol of the curve range, until all intervals pass or adaptive_depth bisections are done
+        progress_ is reported per chunk of each round as part of all rounds, see _eval_legs
+        components kept in curve state are evaluated only at spots not on its grid, so after components are
+        edited the grid is refined again but mostly new components are priced
+        tree grids are limited in size, Monte-Carlo and PDE curves are not refined (see adaptive_limit_step)
+        :return: x, and curve of each component by curve type and component terms
+        """
+        _lower, _upper = self._x_bound(margin_)
+        _strike_list = [_comp.strike for _comp in self._components if _comp.type in option_type]
+        _method = self.engine.get('engine')
+        # seed step is a power of 2, so seed spots and their bisections stay on the grid when the range changes
+        _step = 2. ** floor(log2(max(_upper - _lower, PRECISION_ZERO) / adaptive_seed))
+        _one_pass = _method in [EngineMethod.MC.value, EngineMethod.PDE.value]
+        _seed = self._x_range(margin_, adaptive_limit_step) if _one_pass else \
+            arange(ceil(_lower / _step), _upper / _step) * _step
+        _x = unique(concatenate([_seed, [_lower, _upper],
+                                 clip(array(_strike_list + [self._center], dtype=float), _lower, _upper)]))
+        _limit = self._x_range(margin_, adaptive_limit_step).size if _method == EngineMethod.Tree.value else None
+        _legs = dict()
+        for _comp in self._components + (self._components_show if full_ else []):
+            _legs.setdefault(_comp.terms(), _comp)
+        _count = Counter([_comp.terms() for _comp in self._components])
+        _weight = array([_count[_terms] for _terms in _legs], dtype=float)
+        _engine = self._curve_engine()
+        _kept = {_type: self._kept_state(_type) for _type in types_}
+        _rounds = 0 if _one_pass else adaptive_depth
+
+        def _progress(_round):
+            """progress of evaluation chunks in given round, as part of all rounds"""
+            if progress_ is None:
+                return None
+            return lambda _done, _total: progress_(_round * _total + _done, (_rounds + 1) * _total)
+
+        def _eval(_spot, _round):
+            _res = dict()
+            for _type in types_:
+                _state = _kept[_type]
+                _old = [_terms for _terms in _legs if _state is not None and _terms in _state['leg']]
+                _new = [_terms for _terms in _legs if _terms not in _old]
+                _value = dict()
+                if _old:
+                    _pos = clip(searchsorted(_state['x'], _spot), 0, _state['x'].size - 1)
+                    _known = _state['x'][_pos] == _spot
+                    _y = array([_state['leg'][_terms] for _terms in _old])[:, _pos]
+                    if not _known.all():
+                        _y[:, ~_known] = self._eval_legs(_type, _spot[~_known], [_legs[_terms] for _terms in _old],
+                                                         _progress(_round), _engine)
+                    _value.update(zip(_old, _y))
+                if _new:
+                    _value.update(zip(_new, self._eval_legs(_type, _spot, [_legs[_terms] for _terms in _new],
+                                                            _progress(_round), _engine)))
+                _res[_type] = array([_value[_terms] for _terms in _legs]).reshape(len(_legs), _spot.size)
+            return _res
+
+        _y = _eval(_x, 0)
+        self._report(None, 0, 1, _progress(0))
+        _refine = ones(_x.size - 1, dtype=bool)
+        for _depth in range(_rounds):
+            if _limit is not None and _refine.sum() > _limit - _x.size:
+                # widest failed intervals first, within the limit
+                _failed, _budget = flatnonzero(_refine), max(_limit - _x.size, 0)
+                _refine[:] = False
+                _refine[_failed[argsort(_x[_failed] - _x[_failed + 1], kind='stable')[:_budget]]] = True
+                if not _refine.any():
+                    break
+            _mid = (_x[:-1] + _x[1:])[_refine] / 2
+            _y_mid = _eval(_mid, _depth + 1)
+            _split = zeros(_mid.size, dtype=bool)
+            for _type in types_:
+                _total, _total_mid = _weight @ _y[_type], _weight @ _y_mid[_type]
+                _linear = ((_total[:-1] + _total[1:]) / 2)[_refine]
+                _tol = adaptive_tol * max(_total.max() - _total.min(), PRECISION_ZERO)
+                _split |= abs(_total_mid - _linear) > _tol
+
+            _order = argsort(concatenate([_x, _mid]), kind='stable')
+            _x = concatenate([_x, _mid])[_order]
+            _y = {_type: concatenate([_y[_type], _y_mid[_type]], axis=1)[:, _order] for _type in types_}
+            # both halves of a failed interval are checked in next round
+            _failed = zeros(_refine.size, dtype=bool)
+            _failed[_refine] = _split
+            _refine = repeat(_failed, where(_refine, 2, 1))
+            self._report(None, 0, 1, _progress(_depth + 1))
+            if not _refine.any():
+                break
+        self._report(None, 0, 1, progress_)
+        return _x, {_type: dict(zip(_legs.keys(), _y[_type])) for _type in types_}
+
     def _check_maturity(self):
-        _maturity = set([_comp.maturity for _comp in self._components if _comp.type in option_type])
-        if len(_maturity) > 1:
-            raise ValueError("maturity of all components should be same")
-        return _maturity.pop() if len(_maturity) == 1 else 0
+        return max([_comp.maturity for _comp in self._components if _comp.type in option_type], default=0)
 
     def _check_stock(self):
         return len(list(filter(lambda x: x.type == InstType.Stock.value, self._components))) > 0
+
+
+def _eval_legs(legs_, func_name_, mkt_, engine_):
+    """
+    evaluate curves of given components on spots of market snapshot, one row for each component
+    options and stocks are priced as a book, in one vectorized pass per maturity bucket
+    """
+    _input = (mkt_, ) if engine_ is None else (mkt_, engine_)
+    _shape = mkt_.get(EnvParam.UdSpotForPrice.value).shape
+    if func_name_ in book_func and engine_ is not None and legs_ \
+            and all([isinstance(_leg, (Option, Stock)) for _leg in legs_]):
+        _value = getattr(Book.from_components(legs_), func_name_)(mkt_, engine_)
+        return array(moveaxis(_value, -1, 0), dtype=float).reshape(len(legs_), *_shape)
+    return array([broadcast_to(_leg.__getattribute__(func_name_)(*_input), _shape) for _leg in legs_],
+                 dtype=float).reshape(len(legs_), *_shape)
+
+
+def _path_unit(value_, pair_):
+    """
+    independent samples of Monte-Carlo path values, antithetic paths are averaged with their opposite paths
+    the first pair_ paths pair with the last pair_ ones, paths in between have no pair
+    """
+    if not pair_:
+        return value_
+    return concatenate([(value_[..., :pair_] + value_[..., -pair_:]) / 2, value_[..., pair_:-pair_]], axis=-1)
+
+
+def _eval_book(legs_, greek_, mkt_, engine_):
+    """
+    evaluate PV and greeks of given names of components in one pass
+    :return: dict of arrays by name, one row for each component
+    """
+    _shape = mkt_.get(EnvParam.UdSpotForPrice.value).shape
+    _value = Book.from_components(legs_).greeks(mkt_, engine_, greek_)
+    return {_greek: array(moveaxis(_v, -1, 0), dtype=float).reshape(len(legs_), *_shape)
+            for _greek, _v in _value.items()}
+
+
+def _eval_chunk(legs_, func_name_, mkt_, engine_, rand_spec_):
+    """evaluate components on a chunk of spot grid in a worker process, attaching shared Monte-Carlo draws"""
+    from utils.parallel import SharedArray
+    _shared = SharedArray.attach(rand_spec_)
+    try:
+        return _eval_legs(legs_, func_name_, mkt_, dict(engine_, rand=_shared.array))
+    finally:
+        _shared.close()
@@ -0,0 +1,48 @@
+# coding=utf-8
+"""
+hot paths of pricing and curve generation registered for profiling
+switch on at runtime with profiler.enable(), reports are collected per curve request and per component
+"""
+
+from instrument import Instrument
+from instrument.book import Book
+from instrument.option import Option
+from instrument.portfolio import Portfolio
+from instrument.stock import Stock
+from utils.finite_difference import FiniteDifference
+from utils.lattice import Lattice
+from utils.monte_carlo import MonteCarlo
+from utils.profiler import format_report, profiler
+
+hot_path = [
+    (Portfolio, 'gen_curve', 'gen_curve', 'request'),
+    (Portfolio, 'gen_curves', 'gen_curves', 'request'),
+    (Portfolio, 'iter_curve', 'iter_curve', 'request'),
+    (Portfolio, '_x_range', 'curve.x_range', 'stage'),
+    (Portfolio, '_curve_state', 'curve.state', 'stage'),
+    (Portfolio, '_curve_engine', 'curve.mc_draws', 'stage'),
+    (Portfolio, '_eval_legs', 'curve.eval_legs', 'stage'),
+    (Portfolio, '_x_adaptive', 'curve.x_adaptive', 'stage'),
+    (Portfolio, '_gen_payoff_curve', 'curve.payoff', 'stage'),
+    (Book, '_evaluate', 'Book._evaluate', 'leg'),
+    (Book, 'surface', 'Book.surface', 'leg'),
+    (Book, 'stress', 'Book.stress', 'leg'),
+    (Book, '_bucket_pricer', 'Book._bucket_pricer', 'stage'),
+    (Book, '_bump_greeks', 'Book._bump_greeks', 'stage'),
+    (Instrument, '_load_market', '_load_market', 'stage'),
+    (Instrument, 'net_payoff', 'net_payoff', 'leg'),
+    (Instrument, 'pnl', 'pnl', 'leg'),
+    (Option, '_load_engine', '_load_engine', 'stage'),
+    (MonteCarlo, 'normal', 'MonteCarlo.normal', 'memory'),
+    (MonteCarlo, 'stock_price', 'MonteCarlo.stock_price', 'memory'),
+    (MonteCarlo, 'vanilla', 'MonteCarlo.vanilla', 'memory'),
+    (Lattice, 'price', 'Lattice.price', 'memory'),
+    (FiniteDifference, 'price', 'FiniteDifference.price', 'memory'),
+] + [(_cls, _name, _name, 'leg') for _cls in [Option, Stock]
+     for _name in ['payoff', 'pv', 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna', 'volga']] \
+  + [(Option, _name, _name, 'leg') for _name in ['risk', 'mc_path_value']]
+
+for _target in hot_path:
+    profiler.register(*_target)
+
+__all__ = ['format_report', 'hot_path', 'profiler']
@@ -0,0 +1,83 @@
+# coding=utf-8
+"""definition of market scenario set for stress tests"""
+
+from csv import DictReader
+from enum import Enum
+from json import loads
+from numpy import array, zeros
+from utils import float_int
+
+
+class ShockParam(Enum):
+    """
+    scenario shock parameter
+    spot shock is relative in percent of spot, volatility, rate and dividend yield shocks are absolute in percentage
+    points (rates as continuous rates), time shock is elapsed time in years
+    """
+    Name = 'Scenario'
+    Spot = 'Spot'
+    Volatility = 'UdVolatility'
+    Rate = 'RiskFreeRate'
+    DivYield = 'UdDivYieldRatio'
+    Time = 'Time'
+
+
+shock_param = [ShockParam.Spot.value, ShockParam.Volatility.value, ShockParam.Rate.value, ShockParam.DivYield.value,
+               ShockParam.Time.value]
+
+
+class ScenarioSet(object):
+    """
+    market scenarios held as struct-of-arrays, one position per scenario in each shock array
+    shocks not given in a scenario are zero
+    """
+    def __init__(self, name_, spot_, vol_, rate_, div_, time_):
+        self.name = [str(_name) for _name in name_]
+        self.spot = array(spot_, dtype=float)
+        self.vol = array(vol_, dtype=float)
+        self.rate = array(rate_, dtype=float)
+        self.div = array(div_, dtype=float)
+        self.time = array(time_, dtype=float)
+        if not (len(self.name) == self.spot.size == self.vol.size == self.rate.size == self.div.size ==
+                self.time.size) or self.spot.ndim != 1:
+            raise ValueError("all scenario columns should be one-dimensional and have same length")
+        if (self.spot < -100).any():
+            raise ValueError("spot shock should not be below -100%")
+        if (self.time < 0).any():
+            raise ValueError("non-negative value is required for time shock")
+
+    def __len__(self):
+        return self.spot.size
+
+    @classmethod
+    def from_param(cls, scenario_list_):
+        """build scenario set from a list of scenario dictionaries (ShockParam keys), unnamed scenarios are numbered"""
+        _column = {_param: zeros(len(scenario_list_)) for _param in shock_param}
+        _name = []
+        for _idx, _scenario in enumerate(scenario_list_):
+            _name.append(_scenario.get(ShockParam.Name.value, _idx + 1))
+            for _param in shock_param:
+                _value = _scenario.get(_param, 0)
+                if not isinstance(_value, (int, float)):
+                    raise ValueError("type <int> or <float> is required for {} shock of scenario {}, not {}".format(
+                        _param, _name[-1], type(_value)))
+                _column[_param][_idx] = _value
+        return cls(_name, *[_column[_param] for _param in shock_param])
+
+    @classmethod
+    def load(cls, file_path_):
+        """
+        load scenario set from a json file, a list of scenario dictionaries or {"scenario": [...]},
+        or from a csv file with a header row of ShockParam names
+        """
+        with open(file_path_, newline='') as f:
+            if file_path_.lower().endswith('.json'):
+                _input_data = loads(f.read())
+                _scenario = _input_data.get('scenario') if isinstance(_input_data, dict) else _input_data
+            else:
+                _scenario = [{_key: _value if _key == ShockParam.Name.value else float_int(_value)
+                              for _key, _value in _row.items() if _key and _value not in [None, '']}
+                             for _row in DictReader(f)]
+        if not isinstance(_scenario, list):
+            raise ValueError("scenario list is required")
+        return cls.from_param(_scenario)
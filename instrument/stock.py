@@ -8,6 +8,7 @@ from instrument.env_param import EnvParam
 
 class Stock(Instrument):
     """stock class with basic parameters"""
+    __slots__ = ()
     _name = "stock"
 
     def __init__(self, inst_dict_):
@@ -34,3 +35,28 @@ class Stock(Instrument):
         """no gamma calc needed for stock"""
         _unit = unit_ or self.unit
         return 0 * _unit
+
+    def vega(self, mkt_dict_, engine_, unit_=None):
+        """no vega for stock"""
+        _unit = unit_ or self.unit
+        return 0 * _unit
+
+    def theta(self, mkt_dict_, engine_, unit_=None):
+        """no theta for stock"""
+        _unit = unit_ or self.unit
+        return 0 * _unit
+
+    def rho(self, mkt_dict_, engine_, unit_=None):
+        """no rho for stock"""
+        _unit = unit_ or self.unit
+        return 0 * _unit
+
+    def vanna(self, mkt_dict_, engine_, unit_=None):
+        """no vanna for stock"""
+        _unit = unit_ or self.unit
+        return 0 * _unit
+
+    def volga(self, mkt_dict_, engine_, unit_=None):
+        """no volga for stock"""
+        _unit = unit_ or self.unit
+        return 0 * _unit
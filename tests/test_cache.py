@@ -0,0 +1,28 @@
+# coding=utf-8
+"""pricing cache keys"""
+
+from numpy import ones
+from instrument import InstParam, InstType, Instrument
+from instrument.cache import engine_key, pricing_cache
+from instrument.default_param import env_default_param
+from instrument.env_param import EngineMethod, EngineParam, EnvParam
+from instrument.market import Market
+
+
+def test_attached_draws_not_cached():
+    _engine = dict(engine=EngineMethod.MC.value, param={EngineParam.MCIteration.value: 10000,
+                                                        EngineParam.MCSeed.value: 0})
+    assert engine_key(_engine) is not None and engine_key(dict(_engine, rand=ones(10000))) is None
+
+    _option = Instrument.get_inst({InstParam.InstType.value: InstType.CallOption.value,
+                                   InstParam.OptionStrike.value: 100, InstParam.OptionMaturity.value: 1,
+                                   InstParam.InstUnit.value: 1})
+    _mkt = Market.from_dict({_param: env_default_param[_param] for _param in [
+        EnvParam.RiskFreeRate.value, EnvParam.UdVolatility.value, EnvParam.UdDivYieldRatio.value,
+        EnvParam.UdSpotForPrice.value, EnvParam.PortMaturity.value, EnvParam.RateFormat.value]})
+    _enabled = pricing_cache.enabled
+    pricing_cache.configure(enabled_=True)
+    try:
+        assert _option.pv(_mkt, _engine) != _option.pv(_mkt, dict(_engine, rand=ones(10000)))
+    finally:
+        pricing_cache.configure(enabled_=_enabled)
@@ -0,0 +1,28 @@
+# coding=utf-8
+"""headless curve generator"""
+
+from csv import reader as csv_reader
+from numpy import load
+from os.path import dirname, join as path_join
+from cli import gen_curves, main
+
+portfolio_file = path_join(dirname(dirname(__file__)), 'docs', '123.json')
+
+
+def test_adaptive_curves_share_x():
+    _x, _curves, _show = gen_curves(portfolio_file, ['PV', 'Delta', 'Vega', 'Payoff'], step_=None, full_=True)
+    for _y in _curves.values():
+        assert _y.shape == (1 + len(_show), _x.size)
+
+
+def test_adaptive_npz(tmp_path):
+    assert main([portfolio_file, '-c', 'PV', '-c', 'Delta', '-f', 'npz', '--adaptive', '-o', str(tmp_path)]) == 0
+    _data = load(str(tmp_path / '123.npz'))
+    assert _data['PV'].shape[-1] == _data['Delta'].shape[-1] == _data['x'].size
+
+
+def test_adaptive_csv_all_types(tmp_path):
+    assert main([portfolio_file, '--adaptive', '--full', '-o', str(tmp_path)]) == 0
+    with open(str(tmp_path / '123.csv')) as f:
+        _rows = list(csv_reader(f))
+    assert len(set([len(_row) for _row in _rows])) == 1 and len(_rows) > 2
@@ -0,0 +1,30 @@
+# coding=utf-8
+"""profiling reports of curve requests"""
+
+from os.path import dirname, join as path_join
+from pytest import fixture, mark
+from cli import load_portfolio
+from instrument.env_param import EngineMethod, EngineParam
+from instrument.profile import profiler
+
+portfolio_file = path_join(dirname(dirname(__file__)), 'docs', '123.json')
+
+
+@fixture
+def portfolio():
+    profiler.enable()
+    profiler.clear()
+    yield load_portfolio(portfolio_file)[0]
+    profiler.disable()
+
+
+@mark.parametrize('method', [EngineMethod.BS.value, EngineMethod.MC.value, EngineMethod.PDE.value])
+def test_report_by_leg(portfolio, method):
+    _param = dict(portfolio.engine['param'], **{EngineParam.MCIteration.value: 10000})
+    portfolio.set_engine(dict(engine=method, param=_param))
+    portfolio.gen_curve('Vega', step_=None, full_=True)
+    _report = profiler.last_report()
+    assert set(_report['leg']) == set([str(_comp) for _comp in portfolio._components])
+    for _stats in _report['leg'].values():
+        assert 'Book._evaluate' in _stats
+    assert 'curve.x_adaptive' in _report['stage']
@@ -1,6 +1,7 @@
 # coding=utf-8
 """common utility functions"""
 
+from importlib import import_module
 from numpy.ma import log
 
 PRECISION_ZERO = 10 ** -3
@@ -23,3 +24,16 @@ def to_continuous_rate(rate_):
 def parse_kwargs(kwargs_, parse_list_, alternative_=None):
     """parse kwargs with given parse keys"""
     return tuple([kwargs_.get(_key, alternative_) for _key in parse_list_])
+
+
+def lazy_function(module_name_, func_name_):
+    """function imported from given module on first call, so that heavy modules are only loaded when needed"""
+    _loaded = []
+
+    def _func(*args, **kwargs):
+        if not _loaded:
+            _loaded.append(getattr(import_module(module_name_), func_name_))
+        return _loaded[0](*args, **kwargs)
+
+    _func.__name__ = func_name_
+    return _func
@@ -0,0 +1,152 @@
+# coding=utf-8
+"""Black-Scholes engine"""
+
+from enum import Enum
+from numpy import abs as np_abs, broadcast_arrays, clip, errstate, exp, flatnonzero, full, isfinite, log, maximum, \
+    nan, pi, sqrt, where
+from utils import lazy_function, parse_kwargs
+
+# scipy is imported on first pricing rather than with the pricing core
+ndtr = lazy_function('scipy.special', 'ndtr')
+
+greek_list = ['pv', 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna', 'volga']
+
+# sensitivities to volatility and rates are quoted per percentage point, as they are given in percent
+greek_scale = dict(vega=1e-2, rho=1e-2, vanna=1e-2, volga=1e-4)
+
+# implied volatility is searched within these bounds (decimals)
+implied_vol_bound = (1e-4, 10.)
+
+
+class ImpliedVolStatus(Enum):
+    """result of implied volatility solver for each option"""
+    Solved = 0
+    OutOfBound = 1
+    Invalid = 2
+    NotConverged = 3
+    American = 4
+
+
+class BlackScholes(object):
+    """
+    Black-Scholes closed-form engine
+    all inputs could be scalars or numpy arrays broadcastable against each other
+    sign_ is 1 for call and -1 for put
+    options of zero maturity are expired and valued at intrinsic value
+    """
+
+    @classmethod
+    def pv(cls, sign_, spot_, strike_, **kwargs):
+        """option PV"""
+        return cls.greeks(sign_, spot_, strike_, ['pv'], **kwargs)[0]
+
+    @classmethod
+    def delta(cls, sign_, spot_, strike_, **kwargs):
+        """option DELTA"""
+        return cls.greeks(sign_, spot_, strike_, ['delta'], **kwargs)[0]
+
+    @classmethod
+    def gamma(cls, sign_, spot_, strike_, **kwargs):
+        """option GAMMA, same for call and put"""
+        return cls.greeks(sign_, spot_, strike_, ['gamma'], **kwargs)[0]
+
+    @classmethod
+    def greeks(cls, sign_, spot_, strike_, greek_=None, **kwargs):
+        """
+        option PV and greeks of given names (default all of greek_list) in one pass,
+        d1, d2, discount factors and normal pdf / cdf are computed once and shared by all of them
+        greeks are plain derivatives: VEGA, VANNA and VOLGA by decimal volatility, RHO by decimal rate,
+        THETA by calendar time in years (time decay, i.e. minus derivative by maturity)
+        :return: tuple of arrays in order of greek_
+        """
+        _rate, _div, _vol, _t = parse_kwargs(kwargs, ['rate', 'div', 'vol', 't'], 0)
+        _greek = greek_list if greek_ is None else greek_
+        _live = (spot_ > 0) & (_t > 0)
+        with errstate(divide='ignore', invalid='ignore'):
+            _sqrt_t = sqrt(_t)
+            _d1 = (log(spot_ / strike_) + (_rate - _div + _vol ** 2 / 2) * _t) / _vol / _sqrt_t
+            _d2 = _d1 - _vol * _sqrt_t
+            _df_div, _df_rate = exp(-_div * _t), exp(-_rate * _t)
+            _spot_df, _strike_df = spot_ * _df_div, strike_ * _df_rate
+            # normal pdf / cdf terms are only computed if any requested greek needs them
+            _n1 = ndtr(sign_ * _d1) if {'pv', 'delta', 'theta'} & set(_greek) else None
+            _n2 = ndtr(sign_ * _d2) if {'pv', 'theta', 'rho'} & set(_greek) else None
+            _pdf = exp(-_d1 ** 2 / 2) / sqrt(2 * pi) if set(_greek) - {'pv', 'delta', 'rho'} else None
+            _vega = _spot_df * _pdf * _sqrt_t if {'vega', 'volga'} & set(_greek) else None
+            _kernel = {
+                'pv': lambda: sign_ * (_spot_df * _n1 - _strike_df * _n2),
+                'delta': lambda: sign_ * _df_div * _n1,
+                'gamma': lambda: where(_live, _df_div * _pdf / spot_ / _vol / _sqrt_t, 0),
+                'vega': lambda: _vega,
+                'theta': lambda: sign_ * (_div * _spot_df * _n1 - _rate * _strike_df * _n2) -
+                _spot_df * _pdf * _vol / 2 / _sqrt_t,
+                'rho': lambda: sign_ * _t * _strike_df * _n2,
+                'vanna': lambda: where(_live, -_df_div * _pdf * _d2 / _vol, 0),
+                'volga': lambda: where(_live, _vega * _d1 * _d2 / _vol, 0),
+            }
+            _expired = {
+                'pv': lambda: cls.intrinsic(sign_, spot_, strike_),
+                'delta': lambda: sign_ * (sign_ * (spot_ - strike_) > 0),
+            }
+
+            _res = []
+            for _name in _greek:
+                if _name not in _kernel:
+                    raise ValueError("invalid greek given: {}".format(_name))
+                _res.append(where(_t > 0, _kernel[_name](), _expired.get(_name, lambda: 0)())[()])
+        return tuple(_res)
+
+    @classmethod
+    def implied_vol(cls, sign_, price_, spot_, strike_, tol_=1e-10, max_iter_=64, **kwargs):
+        """
+        implied volatility (decimal) of options quoted at price_, solved for all options together
+        starts from the Corrado-Miller closed-form guess, then takes Halley steps (using VEGA and VOLGA of the same
+        pass) that fall back to bisection whenever they leave the bracket known to hold the solution,
+        solved options are dropped from later iterations
+        :return: volatility (nan if not solved) and ImpliedVolStatus value of each option, flattened
+        """
+        _rate, _div, _t = parse_kwargs(kwargs, ['rate', 'div', 't'], 0)
+        _sign, _price, _spot, _strike, _rate, _div, _t = [_a.astype(float).ravel() for _a in broadcast_arrays(
+            sign_, price_, spot_, strike_, _rate, _div, _t)]
+        _vol = full(_price.size, nan)
+        _status = full(_price.size, ImpliedVolStatus.Solved.value)
+
+        # option price is increasing in volatility, from discounted intrinsic value to spot (call) or strike (put),
+        # time value within tolerance of either bound does not determine volatility
+        _spot_df, _strike_df = _spot * exp(-_div * _t), _strike * exp(-_rate * _t)
+        _lower = maximum(_sign * (_spot_df - _strike_df), 0)
+        _upper = where(_sign > 0, _spot_df, _strike_df)
+        _status[(_price - _lower <= tol_ * _upper) | (_price >= _upper)] = ImpliedVolStatus.OutOfBound.value
+        _status[(_t <= 0) | (_spot <= 0) | (_strike <= 0) | ~isfinite(_price)] = ImpliedVolStatus.Invalid.value
+
+        _idx = flatnonzero(_status == ImpliedVolStatus.Solved.value)
+        _call = _price[_idx] + where(_sign[_idx] > 0, 0, _spot_df[_idx] - _strike_df[_idx])
+        _half = (_spot_df[_idx] - _strike_df[_idx]) / 2
+        with errstate(invalid='ignore'):
+            _guess = sqrt(2 * pi / _t[_idx]) / (_spot_df[_idx] + _strike_df[_idx]) * (
+                _call - _half + sqrt(maximum((_call - _half) ** 2 - 4 * _half ** 2 / pi, 0)))
+        _lo, _hi = full(_idx.size, implied_vol_bound[0]), full(_idx.size, implied_vol_bound[1])
+        _v = where(isfinite(_guess), clip(_guess, *implied_vol_bound), 0.2)
+
+        for _ in range(max_iter_):
+            if not _idx.size:
+                break
+            _pv, _vega, _volga = cls.greeks(_sign[_idx], _spot[_idx], _strike[_idx], ['pv', 'vega', 'volga'],
+                                            rate=_rate[_idx], div=_div[_idx], vol=_v, t=_t[_idx])
+            _diff = _pv - _price[_idx]
+            _done = (np_abs(_diff) <= tol_ * _price[_idx]) | (_hi - _lo <= tol_ * _v)
+            _vol[_idx[_done]] = _v[_done]
+
+            _hi, _lo = where(_diff > 0, _v, _hi), where(_diff < 0, _v, _lo)
+            with errstate(divide='ignore', invalid='ignore'):
+                _next = _v - 2 * _diff * _vega / (2 * _vega ** 2 - _diff * _volga)
+            _next = where(isfinite(_next) & (_next > _lo) & (_next < _hi), _next, (_lo + _hi) / 2)
+            _idx, _v, _lo, _hi = _idx[~_done], _next[~_done], _lo[~_done], _hi[~_done]
+
+        _status[_idx] = ImpliedVolStatus.NotConverged.value
+        return _vol, _status
+
+    @classmethod
+    def intrinsic(cls, sign_, spot_, strike_):
+        """option intrinsic value, i.e. payoff at expiry"""
+        return maximum(sign_ * (spot_ - strike_), 0)
@@ -0,0 +1,94 @@
+# coding=utf-8
+"""bounded LRU cache for pricing results"""
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache(object):
+    """
+    least-recently-used cache bounded by number of entries and by total size of cached numpy arrays
+    cached arrays are read-only copies, since they are shared by every caller hitting the same key,
+    the caller putting a value keeps its own arrays writable
+    """
+    def __init__(self, max_size_=4096, max_bytes_=256 * 2 ** 20):
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self.enabled = True
+        self.max_size = max_size_
+        self.max_bytes = max_bytes_
+
+    def __len__(self):
+        return len(self._data)
+
+    def configure(self, max_size_=None, max_bytes_=None, enabled_=None):
+        """change cache bounds or switch cache on / off, entries are evicted to meet new bounds"""
+        with self._lock:
+            if max_size_ is not None:
+                self.max_size = max_size_
+            if max_bytes_ is not None:
+                self.max_bytes = max_bytes_
+            if enabled_ is not None:
+                self.enabled = enabled_
+            self._evict()
+
+    def get(self, key_):
+        """return (True, value) on hit and (False, None) on miss"""
+        with self._lock:
+            if key_ in self._data:
+                self._data.move_to_end(key_)
+                self._hits += 1
+                return True, self._data[key_][0]
+            self._misses += 1
+            return False, None
+
+    def put(self, key_, value_):
+        """store value, evicting least recently used entries if bounds are exceeded"""
+        _size = _nbytes(value_)
+        if _size > self.max_bytes:
+            return value_
+        with self._lock:
+            if key_ in self._data:
+                self._bytes -= self._data.pop(key_)[1]
+            self._data[key_] = (_frozen(value_), _size)
+            self._bytes += _size
+            self._evict()
+        return value_
+
+    def clear(self):
+        """remove all entries and reset counters"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self):
+        """hit / miss counters and current usage"""
+        return dict(hits=self._hits, misses=self._misses, size=len(self._data), bytes=self._bytes,
+                    max_size=self.max_size, max_bytes=self.max_bytes)
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_size or self._bytes > self.max_bytes):
+            self._bytes -= self._data.popitem(last=False)[1][1]
+
+
+def _nbytes(value_):
+    """total size in bytes of numpy arrays in value"""
+    if isinstance(value_, (tuple, list)):
+        return sum([_nbytes(_v) for _v in value_])
+    return getattr(value_, 'nbytes', 0)
+
+
+def _frozen(value_):
+    """copy of value with numpy arrays copied and made read-only"""
+    if isinstance(value_, (tuple, list)):
+        return type(value_)([_frozen(_v) for _v in value_])
+    if hasattr(value_, 'setflags'):
+        _value = value_.copy()
+        _value.setflags(write=False)
+        return _value
+    return value_
@@ -0,0 +1,132 @@
+# coding=utf-8
+"""finite difference (Crank-Nicolson) engine for the Black-Scholes PDE"""
+
+from numpy import arange, array, broadcast_shapes, ceil, clip, empty_like, exp, maximum, ndim, searchsorted, shape, \
+    sqrt, where, zeros
+from utils import parse_kwargs
+
+# spot grid runs from 0 to the highest spot or strike times exp(grid_width * vol * sqrt(t)), at least grid_min_scale
+# and at most grid_max_scale, and its step must not exceed grid_max_step of the lowest strike
+# (spot steps are added for that up to grid_max_spot_steps when they are not fixed)
+grid_width = 4
+grid_min_scale = 1.5
+grid_max_scale = 16
+grid_max_step = 0.1
+grid_max_spot_steps = 10000
+
+# the first steps are replaced by fully implicit half steps (Rannacher start), damping oscillations from payoff kinks
+rannacher_steps = 2
+
+
+class FiniteDifference(object):
+    """
+    Black-Scholes PDE solved backward in time on a uniform spot grid
+    options of one maturity share the grid and the tridiagonal system, so each time step is one banded solve
+    with one right-hand side column per option, and every grid spot is priced by the same solves
+    """
+
+    @classmethod
+    def price(cls, sign_, spot_, strike_, american_, space_steps_, time_steps_, top_=None, fixed_=True, **kwargs):
+        """
+        option PV, DELTA and GAMMA at given spots, sign_, strike_ and american_ are arrays of options,
+        result is in shape of spot_ broadcast against strike_ (e.g. (spots, 1) spots give (spots, options))
+        DELTA and GAMMA are finite differences on the grid, all three are interpolated to the given spots,
+        early exercise is applied after each time step
+        grid runs up to top_ (see grid_top by default), a fixed top_ keeps the grid when market is bumped
+        with fixed_, a grid of space_steps_ coarser than grid_max_step of the lowest strike raises, otherwise
+        space_steps_ is a minimum and more steps are used as needed (see spot_steps)
+        """
+        from scipy.linalg import solve_banded
+        _rate, _div, _vol, _t = parse_kwargs(kwargs, ['rate', 'div', 'vol', 't'], 0)
+        _sign, _strike, _american = array(sign_, dtype=float), array(strike_, dtype=float), array(american_, dtype=bool)
+        _spot = array(spot_, dtype=float)
+        _top = cls.grid_top(_spot, _strike, _vol, _t) if top_ is None else top_
+        if _spot.max() > _top:
+            raise ValueError("spot above top of finite difference grid")
+        _strike_min = _strike[_strike > 0].min(initial=_top)
+        if not fixed_:
+            space_steps_ = cls.spot_steps(_top, _strike_min, space_steps_)
+        _step = _top / space_steps_
+        if fixed_ and _step > grid_max_step * _strike_min:
+            raise ValueError("finite difference step {:g} is too coarse for strike {:g}, use more spot steps".format(
+                _step, _strike_min))
+        _grid = arange(space_steps_ + 1) * _step
+        _payoff = maximum(_sign * (_grid[:, None] - _strike), 0)
+
+        # coefficients of V[i - 1], V[i] and V[i + 1] in the PDE operator, with spot i * step
+        _i = arange(space_steps_ + 1, dtype=float)
+        _lower, _diag, _upper = (_vol * _i) ** 2 / 2 - (_rate - _div) * _i / 2, -(_vol * _i) ** 2 - _rate, \
+            (_vol * _i) ** 2 / 2 + (_rate - _div) * _i / 2
+
+        def _apply(_value, _scale):
+            """(1 + scale * operator) on interior and lower boundary rows"""
+            _res = _value * (1 + _scale * _diag[:, None])
+            _res[1:] += _scale * _lower[1:, None] * _value[:-1]
+            _res[:-1] += _scale * _upper[:-1, None] * _value[1:]
+            return _res
+
+        def _banded(_scale):
+            """(1 - scale * operator) in banded form, last row is the boundary value"""
+            _ab = zeros((3, space_steps_ + 1))
+            _ab[0, 1:] = -_scale * _upper[:-1]
+            _ab[1] = 1 - _scale * _diag
+            _ab[2, :-1] = -_scale * _lower[1:]
+            _ab[1, -1], _ab[2, -2] = 1, 0
+            return _ab
+
+        # backward in time, each step is (1 - theta * dt * L) V_new = (1 + (1 - theta) * dt * L) V_old
+        _dt = _t / time_steps_
+        _start = min(rannacher_steps, time_steps_)
+        _schedule = [(_dt / 2, 1.)] * (2 * _start) + [(_dt, .5)] * (time_steps_ - _start)
+        _system = {_key: _banded(_key[0] * _key[1]) for _key in set(_schedule)}
+        _value, _elapsed = _payoff, 0
+        for _h, _theta in _schedule:
+            _elapsed += _h
+            _rhs = _apply(_value, _h * (1 - _theta))
+            # far boundary: discounted forward payoff, exercised at once if American
+            _far = _sign * (_top * exp(-_div * _elapsed) - _strike * exp(-_rate * _elapsed))
+            _rhs[-1] = where(_american, maximum(_far, _payoff[-1]), maximum(_far, 0))
+            _value = solve_banded((1, 1), _system[(_h, _theta)], _rhs, overwrite_b=True, check_finite=False)
+            _value = where(_american, maximum(_value, _payoff), _value)
+
+        # grid DELTA by central differences, GAMMA by second differences, one-sided at both ends
+        _delta, _gamma = empty_like(_value), empty_like(_value)
+        _delta[1:-1] = (_value[2:] - _value[:-2]) / 2 / _step
+        _delta[0], _delta[-1] = (_value[1] - _value[0]) / _step, (_value[-1] - _value[-2]) / _step
+        _gamma[1:-1] = (_value[2:] - 2 * _value[1:-1] + _value[:-2]) / _step ** 2
+        _gamma[0], _gamma[-1] = _gamma[1], _gamma[-2]
+
+        # PV and DELTA by cubic Hermite interpolation (with DELTA and GAMMA as slopes), GAMMA linearly
+        _shape = broadcast_shapes(shape(spot_), _strike.shape)
+        _x = _spot.ravel()
+        _idx = clip(searchsorted(_grid, _x, side='right') - 1, 0, space_steps_ - 1)
+        _w = ((_x - _grid[_idx]) / _step)[:, None]
+        _pv = cls._hermite(_value[_idx], _value[_idx + 1], _delta[_idx], _delta[_idx + 1], _w, _step)
+        _delta_x = cls._hermite(_delta[_idx], _delta[_idx + 1], _gamma[_idx], _gamma[_idx + 1], _w, _step)
+        _gamma_x = _gamma[_idx] * (1 - _w) + _gamma[_idx + 1] * _w
+        return tuple([_v.reshape(_shape)[()] if ndim(_v) else _v for _v in [_pv, _delta_x, _gamma_x]])
+
+    @staticmethod
+    def grid_top(spot_, strike_, vol_, t_):
+        """
+        top of spot grid, far enough above given spots and strikes for the boundary value to hold,
+        capped so that long-dated high volatility options still get a fine enough grid around strikes
+        """
+        return max(array(spot_).max(), array(strike_).max()) * \
+            min(max(exp(grid_width * vol_ * sqrt(t_)), grid_min_scale), grid_max_scale)
+
+    @staticmethod
+    def spot_steps(top_, strike_min_, space_steps_):
+        """
+        spot steps of a grid up to top_, at least space_steps_ and enough for a step within grid_max_step of
+        the lowest strike, but no more than grid_max_spot_steps unless space_steps_ is already above it
+        """
+        _steps = int(ceil(top_ / (grid_max_step * strike_min_)))
+        return max(space_steps_, min(_steps, grid_max_spot_steps))
+
+    @staticmethod
+    def _hermite(y0_, y1_, dy0_, dy1_, w_, step_):
+        """cubic Hermite interpolation at fraction w_ of an interval of length step_"""
+        _w2, _w3 = w_ ** 2, w_ ** 3
+        return (2 * _w3 - 3 * _w2 + 1) * y0_ + (w_ - 2 * _w2 + _w3) * step_ * dy0_ + (-2 * _w3 + 3 * _w2) * y1_ + \
+            (_w3 - _w2) * step_ * dy1_
@@ -0,0 +1,83 @@
+# coding=utf-8
+"""lattice (binomial / trinomial tree) engine"""
+
+from numpy import arange, broadcast_arrays, errstate, exp, maximum, sqrt, where
+from utils import parse_kwargs
+
+# DELTA and GAMMA are read off the nodes of the first steps, two (binomial) or one (trinomial) steps are needed
+# ahead of the root besides the last step
+binomial_min_steps = 3
+trinomial_min_steps = 2
+
+
+class Lattice(object):
+    """
+    recombining tree engine for vanilla options with optional early exercise
+    sign_, spot_, strike_ and american_ could be scalars or numpy arrays broadcastable against each other,
+    rate, div, vol and t are scalars shared by all options, so every option is rolled back on the same tree
+    shape and backward induction runs one whole layer of all options at a time, keeping only the current layer
+    """
+
+    @classmethod
+    def price(cls, sign_, spot_, strike_, american_, steps_, trinomial_=False, **kwargs):
+        """
+        option PV, DELTA and GAMMA, DELTA and GAMMA are read off the first nodes of the tree
+        binomial tree is Cox-Ross-Rubinstein, trinomial tree is Boyle's with nodes spaced vol * sqrt(2 * dt)
+        """
+        _rate, _div, _vol, _t = parse_kwargs(kwargs, ['rate', 'div', 'vol', 't'], 0)
+        _min_steps = trinomial_min_steps if trinomial_ else binomial_min_steps
+        if steps_ < _min_steps:
+            raise ValueError("at least {} steps are required for {} tree, not {}".format(
+                _min_steps, 'trinomial' if trinomial_ else 'binomial', steps_))
+        if _vol <= 0:
+            raise ValueError("positive volatility is required for tree, not {}".format(_vol))
+        _sign, _spot, _strike, _american = [_a[..., None] for _a in broadcast_arrays(
+            sign_, spot_, strike_, american_)]
+        _dt = _t / steps_
+        _df = exp(-_rate * _dt)
+        _growth = exp((_rate - _div) * _dt)
+
+        if trinomial_:
+            _up = exp(_vol * sqrt(2 * _dt))
+            _half_up, _half_down = exp(_vol * sqrt(_dt / 2)), exp(-_vol * sqrt(_dt / 2))
+            _p_up = ((sqrt(_growth) - _half_down) / (_half_up - _half_down)) ** 2
+            _p_down = ((_half_up - sqrt(_growth)) / (_half_up - _half_down)) ** 2
+            _prob = (_p_down * _df, (1 - _p_up - _p_down) * _df, _p_up * _df)
+            _layer = 1
+        else:
+            _up = exp(_vol * sqrt(_dt))
+            _p_up = (_growth - 1 / _up) / (_up - 1 / _up)
+            _prob = ((1 - _p_up) * _df, _p_up * _df)
+            _layer = 2
+        if not (0 <= min(_prob) and max(_prob) <= 1):
+            raise ValueError("tree probabilities out of [0, 1], use more steps")
+
+        def _node(_step):
+            """spots of nodes after given number of steps, lowest first"""
+            _power = arange(-_step, _step + 1) if trinomial_ else arange(-_step, _step + 1, 2)
+            return _spot * _up ** _power
+
+        _value = maximum(_sign * (_node(steps_) - _strike), 0)
+        # exercise values of all node spots any step could reach, nodes of each step are a (strided) slice of them
+        _exercise = where(_american, _sign * (_spot * _up ** arange(-steps_, steps_ + 1) - _strike), 0) \
+            if _american.any() else None
+        _kept = dict()
+        for _step in range(steps_ - 1, -1, -1):
+            _size = _value.shape[-1] - len(_prob) + 1
+            _value = sum([_p * _value[..., _i:_i + _size] for _i, _p in enumerate(_prob)])
+            if _exercise is not None:
+                _value = maximum(_value, _exercise[..., steps_ - _step:steps_ + _step + 1:1 if trinomial_ else 2])
+            if _step <= _layer:
+                _kept[_step] = _value
+
+        # DELTA from the nodes one step ahead, GAMMA from the three nodes one (trinomial) or two (binomial) steps ahead
+        _v1, _s1 = _kept[1], _node(1)
+        _v, _s = _kept[_layer], _node(_layer)
+        with errstate(divide='ignore', invalid='ignore'):
+            _delta = (_v1[..., -1] - _v1[..., 0]) / (_s1[..., -1] - _s1[..., 0])
+            _gamma = ((_v[..., 2] - _v[..., 1]) / (_s[..., 2] - _s[..., 1]) -
+                      (_v[..., 1] - _v[..., 0]) / (_s[..., 1] - _s[..., 0])) / ((_s[..., 2] - _s[..., 0]) / 2)
+        # all nodes coincide at zero spot, where a put is exercised at once (American) or held to maturity
+        _zero_delta = where(_sign[..., 0] < 0, -where(_american[..., 0], 1, exp(-_div * _t)), 0)
+        _positive = _spot[..., 0] > 0
+        return _kept[0][..., 0][()], where(_positive, _delta, _zero_delta)[()], where(_positive, _gamma, 0)[()]
@@ -1,17 +1,141 @@
 # coding=utf-8
 """Monte-Carlo engine"""
 
-from numpy.ma import exp, sqrt
-from numpy.random import normal as rand_norm
+from numpy import broadcast_arrays, concatenate, cumsum, empty, errstate, exp, searchsorted, sqrt, where
 from utils import parse_kwargs
 
+BLOCK_SIZE = 2 ** 16
+
 
 class MonteCarlo(object):
     """Monte Carlo Engine"""
 
+    @classmethod
+    def normal(cls, iteration_=1, antithetic_=False, seed_=None, workers_=1):
+        """
+        generate standard normal draws which could be shared by several simulations
+        antithetic draws are generated in pairs of opposite sign
+        draws are generated in fixed-size blocks, each with its own stream spawned from seed_,
+        so the result for a given seed does not depend on the number of workers
+        """
+        from numpy.random import SeedSequence
+        _size = (iteration_ + 1) // 2 if antithetic_ else iteration_
+        _seq = SeedSequence(seed_).spawn(-(-_size // BLOCK_SIZE))
+        _blocks = [(_idx * BLOCK_SIZE, min((_idx + 1) * BLOCK_SIZE, _size), _s) for _idx, _s in enumerate(_seq)]
+
+        if workers_ > 1 and len(_blocks) > 1:
+            from utils.parallel import SharedArray, pool_map
+            with SharedArray(_size) as _shared:
+                _jobs = [(_shared.spec(), _blocks[_idx::workers_]) for _idx in range(min(workers_, len(_blocks)))]
+                pool_map(_fill_normal, _jobs, workers_)
+                _rand = _shared.array.copy()
+        else:
+            _rand = empty(_size)
+            _fill_blocks(_rand, _blocks)
+
+        if antithetic_:
+            return concatenate([_rand, -_rand])[:iteration_]
+        return _rand
+
+    @classmethod
+    def normal_batches(cls, iteration_=1, batch_=BLOCK_SIZE, antithetic_=False, seed_=None):
+        """
+        generate standard normal draws batch by batch for progressive estimation
+        batches follow the same seeded blocks as normal(), antithetic batches hold their own pairs of opposite sign,
+        so all batches together hold the draws of normal(): with odd iteration_ the last draw has no pair
+        """
+        from numpy.random import SeedSequence, default_rng
+        _size = (iteration_ + 1) // 2 if antithetic_ else iteration_
+        _batch = max(batch_ // 2 if antithetic_ else batch_, 1)
+        _seq = SeedSequence(seed_).spawn(-(-_size // BLOCK_SIZE))
+        _buffer = empty(0)
+        for _idx, _s in enumerate(_seq):
+            _block = default_rng(_s).standard_normal(min(BLOCK_SIZE, _size - _idx * BLOCK_SIZE))
+            _buffer = concatenate([_buffer, _block])
+            while _buffer.size >= _batch or (_idx == len(_seq) - 1 and _buffer.size):
+                _rand, _buffer = _buffer[:_batch], _buffer[_batch:]
+                if antithetic_:
+                    _last = _idx == len(_seq) - 1 and not _buffer.size
+                    _rand = concatenate([_rand, -_rand[:_rand.size - (_last and iteration_ % 2)]])
+                yield _rand
+
+    @classmethod
+    def control_variate(cls, sample_, control_, control_mean_):
+        """
+        estimate mean of sample with a control variate of known mean
+        the optimal coefficient is estimated from the same paths
+        """
+        _control_dev = control_ - control_.mean()
+        _var = (_control_dev ** 2).mean()
+        _beta = (sample_ * _control_dev).mean() / _var if _var > 0 else 0
+        return sample_.mean() - _beta * (control_.mean() - control_mean_)
+
+    @classmethod
+    def vanilla(cls, sign_, spot_, strike_, rand_, control_=False, sums_=None, **kwargs):
+        """
+        discounted PV, pathwise DELTA and pathwise / likelihood-ratio GAMMA of vanilla options of one maturity
+        sign_, spot_ and strike_ broadcast against each other, sign_ is 1 for call and -1 for put
+        rand_ must be sorted ascending: terminal prices are then sorted too, so each option only needs a
+        binary search for its exercise boundary and a lookup in prefix sums instead of a pass over all paths
+        sums_ could be a dict kept between calls on the same draws, terminal prices and prefix sums are then
+        computed once for each market (e.g. once per bump for all chunks of a spot grid)
+        """
+        _rate, _div, _vol, _t = parse_kwargs(kwargs, ['rate', 'div', 'vol', 't'], 0)
+        _n = rand_.size
+        _key = (_rate, _div, _vol, _t)
+        if sums_ is not None and _key in sums_:
+            _growth, _sum_g, _sum_gs, _sum_gg = sums_[_key]
+        else:
+            _growth = exp((_rate - _div - _vol ** 2 / 2) * _t + _vol * sqrt(_t) * rand_)
+            _score = rand_ / _vol / sqrt(_t) - 1
+            _sum_g, _sum_gs, _sum_gg = [concatenate([[0], cumsum(_a)]) for _a in [_growth, _growth * _score,
+                                                                                  _growth ** 2]]
+            if sums_ is not None:
+                sums_[_key] = _growth, _sum_g, _sum_gs, _sum_gg
+
+        _sign, _spot, _strike = broadcast_arrays(sign_, spot_, strike_)
+        with errstate(divide='ignore'):
+            _idx = searchsorted(_growth, _strike / _spot, side='right')
+        _call = _sign > 0
+
+        def _itm_sum(_sum):
+            return where(_call, _sum[-1] - _sum[_idx], _sum[_idx])
+
+        _count, _g, _gs = where(_call, _n - _idx, _idx), _itm_sum(_sum_g), _itm_sum(_sum_gs)
+        _pv = _sign * (_spot * _g - _strike * _count) / _n
+        if control_:
+            _g_mean = _sum_g[-1] / _n
+            _g_var = _sum_gg[-1] / _n - _g_mean ** 2
+            _cov = _sign * (_spot * _itm_sum(_sum_gg) - _strike * _g) / _n - _pv * _g_mean
+            _pv = _pv - _cov / _g_var * (_g_mean - exp((_rate - _div) * _t))
+        with errstate(divide='ignore', invalid='ignore'):
+            _gamma = where(_spot > 0, _sign * _gs / _n / _spot, 0)
+        _df = exp(-_rate * _t)
+        return _pv * _df, _sign * _g / _n * _df, _gamma * _df
+
     @classmethod
     def stock_price(cls, iteration_=1, **kwargs):
-        """generate stock spot through stochastic process"""
-        _rand = rand_norm(0, 1, iteration_)
+        """
+        generate stock spot through stochastic process
+        pre-generated standard normal draws could be given through 'rand' to use common random numbers
+        """
+        _rand = kwargs.get('rand')
+        if _rand is None:
+            _rand = cls.normal(iteration_, seed_=kwargs.get('seed'))
         _isp, _rate, _div, _vol, _t = parse_kwargs(kwargs, ['isp', 'rate', 'div', 'vol', 't'], 0)
         return _isp * exp((_rate - _div - _vol ** 2 / 2) * _t + _vol * sqrt(_t) * _rand)
+
+
+def _fill_blocks(rand_, blocks_):
+    from numpy.random import default_rng
+    for _start, _stop, _seq in blocks_:
+        default_rng(_seq).standard_normal(out=rand_[_start:_stop])
+
+
+def _fill_normal(spec_, blocks_):
+    from utils.parallel import SharedArray
+    _shared = SharedArray.attach(spec_)
+    try:
+        _fill_blocks(_shared.array, blocks_)
+    finally:
+        _shared.close()
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""process pool helpers sharing large numpy buffers through shared memory"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from numpy import dtype as np_dtype, ndarray, prod
+
+
+class SharedArray(object):
+    """
+    numpy array placed in shared memory
+    worker processes attach it by spec (name, shape, dtype) instead of receiving a pickled copy
+    """
+    def __init__(self, shape_, dtype_='float64', name_=None):
+        self._shape = tuple(shape_) if isinstance(shape_, (tuple, list)) else (shape_, )
+        self._dtype = np_dtype(dtype_)
+        _size = max(int(prod(self._shape)) * self._dtype.itemsize, 1)
+        self._owner = name_ is None
+        self._shm = SharedMemory(create=True, size=_size) if self._owner else SharedMemory(name=name_)
+        self.array = ndarray(self._shape, dtype=self._dtype, buffer=self._shm.buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @classmethod
+    def from_array(cls, array_):
+        """create shared array holding a copy of given array"""
+        _shared = cls(array_.shape, array_.dtype)
+        _shared.array[...] = array_
+        return _shared
+
+    @classmethod
+    def attach(cls, spec_):
+        """attach shared array created by another process"""
+        _name, _shape, _dtype = spec_
+        return cls(_shape, _dtype, _name)
+
+    def spec(self):
+        """picklable description to attach this array from another process"""
+        return self._shm.name, self._shape, self._dtype.str
+
+    def close(self):
+        """release the buffer, and free shared memory if it was created by this process"""
+        self.array = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def pool_map(func_, args_list_, workers_):
+    """run func_ on each argument tuple in a process pool, results are returned in input order"""
+    return list(pool_imap(func_, args_list_, workers_))
+
+
+def pool_imap(func_, args_list_, workers_):
+    """
+    run func_ on each argument tuple in a process pool, results are yielded in input order once ready
+    pending tasks are cancelled if the generator is closed early
+    """
+    _pool = ProcessPoolExecutor(max_workers=workers_)
+    try:
+        for _res in _pool.map(func_, *zip(*args_list_)):
+            yield _res
+    finally:
+        _pool.shutdown(wait=True, cancel_futures=True)
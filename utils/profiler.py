@@ -0,0 +1,208 @@
+# coding=utf-8
+"""
+runtime instrumentation of hot paths
+registered methods are replaced by timing wrappers only while profiling is enabled,
+so the original functions run untouched and nothing is recorded when it is disabled
+"""
+
+from collections import deque
+from functools import wraps
+from inspect import getattr_static, isgeneratorfunction
+from threading import Lock, local
+from time import perf_counter
+from tracemalloc import get_traced_memory, is_tracing, start as trace_start, stop as trace_stop
+
+
+class StageStat(object):
+    """call count, wall time and peak traced memory of one stage"""
+    __slots__ = ('count', 'time', 'peak')
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.
+        self.peak = 0
+
+    def add(self, time_, peak_=0):
+        """record one call"""
+        self.count += 1
+        self.time += time_
+        self.peak = max(self.peak, peak_)
+
+    def to_dict(self):
+        """plain dictionary for reports"""
+        return dict(count=self.count, time=self.time, peak=self.peak)
+
+
+class Request(object):
+    """stages recorded during one top level request, e.g. one curve, in total and by leg"""
+    def __init__(self, name_):
+        self.name = name_
+        self.time = 0.
+        self.stage = dict()
+        self.leg = dict()
+
+    def add(self, stage_, leg_, time_, peak_=0):
+        """
+        record one call of stage_, attributed to leg_ if given
+        leg_ could be a tuple of legs priced together, e.g. a book, which then share the time equally
+        """
+        self.stage.setdefault(stage_, StageStat()).add(time_, peak_)
+        if leg_ is not None:
+            _legs = leg_ if isinstance(leg_, tuple) else (leg_, )
+            for _leg in _legs:
+                self.leg.setdefault(_leg, dict()).setdefault(stage_, StageStat()).add(time_ / len(_legs), peak_)
+
+    def to_dict(self):
+        """plain dictionary for reports"""
+        return dict(name=self.name, time=self.time,
+                    stage={_stage: _stat.to_dict() for _stage, _stat in self.stage.items()},
+                    leg={_leg: {_stage: _stat.to_dict() for _stage, _stat in _stats.items()}
+                         for _leg, _stats in self.leg.items()})
+
+
+class Profiler(object):
+    """
+    profiler of registered hot paths
+    targets are registered as (owner, attribute name, stage name, kind) where kind is
+        'request' - a top level call, stages called inside are collected in one report
+        'leg' - a method of a portfolio component, stages called inside are attributed to the component,
+                or a method of a book (an object with a list of leg names in label), attributed to all its legs
+        'stage' - a timed stage
+        'memory' - a timed stage also recording peak traced memory
+    calls outside any request are collected in a request named after the first stage called
+    """
+    def __init__(self, history_=20):
+        self._targets = []
+        self._original = []
+        self._lock = Lock()
+        self._local = local()
+        self._history = deque(maxlen=history_)
+        self.enabled = False
+
+    def register(self, owner_, name_, stage_, kind_='stage'):
+        """register a method or function attribute of owner_ to be profiled"""
+        self._targets.append((owner_, name_, stage_, kind_))
+        if self.enabled:
+            self._patch(*self._targets[-1])
+
+    def enable(self):
+        """start profiling registered targets"""
+        with self._lock:
+            if not self.enabled:
+                for _target in self._targets:
+                    self._patch(*_target)
+                self.enabled = True
+
+    def disable(self):
+        """stop profiling and restore original targets, recorded reports are kept"""
+        with self._lock:
+            while self._original:
+                _owner, _name, _attr = self._original.pop()
+                setattr(_owner, _name, _attr)
+            self.enabled = False
+
+    def reports(self):
+        """reports of recent requests, latest last"""
+        with self._lock:
+            return [_request.to_dict() for _request in self._history]
+
+    def last_report(self):
+        """report of latest request, None if nothing was recorded"""
+        with self._lock:
+            return self._history[-1].to_dict() if self._history else None
+
+    def clear(self):
+        """drop recorded reports"""
+        with self._lock:
+            self._history.clear()
+
+    def _patch(self, owner_, name_, stage_, kind_):
+        _attr = getattr_static(owner_, name_)
+        _wrap = type(_attr) if isinstance(_attr, (staticmethod, classmethod)) else None
+        _func = _attr.__func__ if _wrap else _attr
+        _timed = self._timed_gen(_func, stage_, kind_) if isgeneratorfunction(_func) \
+            else self._timed(_func, stage_, kind_)
+        self._original.append((owner_, name_, _attr))
+        setattr(owner_, name_, _wrap(_timed) if _wrap else _timed)
+
+    def _enter(self, stage_, kind_, args_):
+        _state = self._local
+        if getattr(_state, 'request', None) is None:
+            # requests are named with their first argument, e.g. curve type
+            _name = "{} {}".format(stage_, args_[1]) if kind_ == 'request' and len(args_) > 1 else stage_
+            _state.request, _state.leg = Request(_name), None
+            _owner = True
+        else:
+            _owner = False
+        _leg = _state.leg
+        if kind_ == 'leg' and _leg is None and args_:
+            _state.leg = _leg_name(args_[0])
+        return _owner, _leg
+
+    def _exit(self, stage_, kind_, owner_, leg_, time_, peak_):
+        _state = self._local
+        _request = _state.request
+        _request.add(stage_, leg_ if leg_ is not None else _state.leg, time_, peak_)
+        _state.leg = leg_
+        if owner_:
+            _request.time = time_
+            _state.request = None
+            with self._lock:
+                self._history.append(_request)
+
+    def _timed(self, func_, stage_, kind_):
+        @wraps(func_)
+        def _wrapper(*args, **kwargs):
+            _owner, _leg = self._enter(stage_, kind_, args)
+            _tracing = kind_ == 'memory' and not is_tracing()
+            if _tracing:
+                trace_start()
+            _start = perf_counter()
+            try:
+                return func_(*args, **kwargs)
+            finally:
+                _time = perf_counter() - _start
+                _peak = 0
+                if _tracing:
+                    _peak = get_traced_memory()[1]
+                    trace_stop()
+                self._exit(stage_, kind_, _owner, _leg, _time, _peak)
+        return _wrapper
+
+    def _timed_gen(self, func_, stage_, kind_):
+        @wraps(func_)
+        def _wrapper(*args, **kwargs):
+            _owner, _leg = self._enter(stage_, kind_, args)
+            _start = perf_counter()
+            try:
+                yield from func_(*args, **kwargs)
+            finally:
+                self._exit(stage_, kind_, _owner, _leg, perf_counter() - _start, 0)
+        return _wrapper
+
+
+def _leg_name(obj_):
+    """name of a component, or names of all legs of a book"""
+    _label = getattr(obj_, 'label', None)
+    return tuple(_label) if isinstance(_label, list) else str(obj_)
+
+
+def format_report(report_):
+    """readable text of a request report, stages are sorted by time spent"""
+    _lines = ["{}: {:.6f} s".format(report_['name'], report_['time'])]
+    _fmt = "    {:<24} {:>8} {:>12.6f} s{}"
+
+    def _stat_lines(stats_):
+        for _stage, _stat in sorted(stats_.items(), key=lambda _item: -_item[1]['time']):
+            _peak = ", peak {:.1f} MB".format(_stat['peak'] / 2 ** 20) if _stat['peak'] else ""
+            _lines.append(_fmt.format(_stage, _stat['count'], _stat['time'], _peak))
+
+    _stat_lines(report_['stage'])
+    _legs = sorted(report_['leg'].items(), key=lambda _item: -max([_s['time'] for _s in _item[1].values()]))
+    for _leg, _stats in _legs:
+        _lines.append("  leg {}".format(_leg))
+        _stat_lines(_stats)
+    return "\n".join(_lines)
+
+
+profiler = Profiler()